@@ -0,0 +1,254 @@
+"""
+Build graph for derived files: each artifact lists the files it is built from and the artifacts
+it reads, and is rebuilt only when one of its inputs changed (size and mtime, confirmed by a
+content hash), in dependency order with independent artifacts built in parallel
+"""
+
+import glob
+import hashlib
+import json
+import os
+from functools import partial
+from parallel import Report, parallel_map
+
+MANIFEST = 'Data/0-manifest.json'
+DEFAULT_PATH = 'Data/Price_Data/Energy_S&P500'
+DIVIDENDS_PATH = 'Data/Dividends_Data/Energy_S&P500'
+# Per-ticker bar files, the derived files in the same folder start with '0'
+BAR_FILES = '[!0]*.csv'
+
+
+def content_hash(file, block=1 << 20):
+    digest = hashlib.sha1()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_state(file, previous=None):
+    """
+    Returns [size, mtime_ns, sha1] of a file, only hashing it again when size or mtime moved
+    """
+    stat = os.stat(file)
+    if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime_ns:
+        return previous
+    return [stat.st_size, stat.st_mtime_ns, content_hash(file)]
+
+
+class Artifact:
+    """
+    A derived file (or glob of files) built by build(changed) from the files matching inputs
+    and the targets of the artifacts in deps. changed lists the input files added, modified or
+    removed since the last build, or is None when everything has to be built
+    """
+    def __init__(self, name, target, inputs, build, deps=()):
+        self.name = name
+        self.target = target
+        self.inputs = list(inputs)
+        self.build = build
+        self.deps = tuple(deps)
+
+    def exists(self):
+        return bool(glob.glob(self.target))
+
+
+class BuildGraph:
+    """
+    Artifacts by name. The manifest records the input states of each built artifact under its
+    target, so graphs over different folders can share one manifest file
+    """
+    def __init__(self, manifest=MANIFEST):
+        self.manifest = manifest
+        self.artifacts = {}
+
+    def add(self, name, target, inputs, build, deps=()):
+        self.artifacts[name] = Artifact(name, target, inputs, build, deps)
+        return self
+
+    def files(self, name):
+        "Returns the current input files of an artifact, including the targets of its dependencies"
+        artifact = self.artifacts[name]
+        patterns = artifact.inputs + [self.artifacts[dep].target for dep in artifact.deps]
+        return sorted({file for pattern in patterns for file in glob.glob(pattern)})
+
+    def levels(self, names=None):
+        """
+        Returns the artifacts (default: all, otherwise names and everything they depend on)
+        as lists that only depend on earlier lists
+        """
+        wanted = set()
+        pending = list(self.artifacts if names is None else names)
+        while pending:
+            name = pending.pop()
+            if name not in self.artifacts:
+                raise KeyError(f"Unknown artifact {name!r}")
+            if name not in wanted:
+                wanted.add(name)
+                pending.extend(self.artifacts[name].deps)
+
+        levels, done = [], set()
+        while len(done) < len(wanted):
+            level = sorted(name for name in wanted - done if set(self.artifacts[name].deps) <= done)
+            if not level:
+                raise ValueError(f"Dependency cycle between {sorted(wanted - done)}")
+            levels.append(level)
+            done.update(level)
+        return levels
+
+    def load_manifest(self):
+        if os.path.exists(self.manifest):
+            with open(self.manifest) as f:
+                return json.load(f)
+        return {}
+
+    def save_manifest(self, manifest):
+        os.makedirs(os.path.dirname(self.manifest) or '.', exist_ok=True)
+        with open(self.manifest, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+
+    def changes(self, name, manifest):
+        """
+        Returns the current input states of an artifact and the input files that changed since its
+        last build (None when it was never built or its target is missing)
+        """
+        key = self.artifacts[name].target
+        previous = manifest.get(key, {})
+        states = {file: file_state(file, previous.get(file)) for file in self.files(name)}
+        if key not in manifest or not self.artifacts[name].exists():
+            return states, None
+        changed = [file for file, state in states.items() if previous.get(file, [None] * 3)[2] != state[2]]
+        changed += [file for file in previous if file not in states]
+        return states, sorted(changed)
+
+    def stale(self):
+        "Returns the artifacts whose inputs changed, artifacts downstream of them are rebuilt as well"
+        manifest = self.load_manifest()
+        stale = []
+        for level in self.levels():
+            for name in level:
+                states, changed = self.changes(name, manifest)
+                if (states and changed != []) or set(self.artifacts[name].deps) & set(stale):
+                    stale.append(name)
+        return stale
+
+    def build(self, names=None, workers=None, force=False):
+        """
+        Rebuilds the stale artifacts (default: all, otherwise names and their dependencies) level by
+        level, building the artifacts of one level in parallel. Artifacts downstream of a failed one
+        are skipped. Returns a Report keyed by artifact name
+        """
+        manifest = self.load_manifest()
+        report = Report('artifacts')
+        failed = set()
+        for level in self.levels(names):
+            todo, states = {}, {}
+            for name in level:
+                if failed & set(self.artifacts[name].deps):
+                    failed.add(name)
+                    continue
+                states[name], changed = self.changes(name, manifest)
+                # Nothing to build from, e.g. the polygon_api pipeline folders were never downloaded
+                if not states[name]:
+                    continue
+                if force or changed != []:
+                    todo[name] = None if force else changed
+                else:
+                    # Touched but unchanged inputs get their new mtime so they are not hashed again
+                    manifest[self.artifacts[name].target] = states[name]
+
+            if not todo:
+                self.save_manifest(manifest)
+                continue
+            done = parallel_map(partial(_build_artifact, artifacts=self.artifacts, changes=todo), list(todo),
+                                workers=workers, chunksize=1, name='artifacts')
+            for name in done.results:
+                # The states read before building, inputs changed while building show up next time
+                manifest[self.artifacts[name].target] = states[name]
+                report.results[name] = done.results[name]
+            report.errors.update(done.errors)
+            failed.update(done.errors)
+            self.save_manifest(manifest)
+
+        print(report)
+        return report
+
+
+def _build_artifact(name, artifacts, changes):
+    changed = changes[name]
+    print(f"Building {name}" + ('' if changed is None else f" ({len(changed)} inputs changed)"))
+    artifacts[name].build(changed)
+    return artifacts[name].target
+
+
+def build_closes(changed, path=DEFAULT_PATH):
+    import polygon_api_new
+    polygon_api_new.get_closing_prices(path, workers=1)
+
+
+def build_summary(changed, path=DEFAULT_PATH):
+    import screener
+    screener.update_summary(path)
+
+
+def build_correlation(changed, path=DEFAULT_PATH):
+    import polygon_api_new
+    polygon_api_new.get_corr(polygon_api_new.returns_from_closes(path)).to_csv(f"{path}/0-correlation.csv")
+
+
+def build_returns_workbook(changed, path=DEFAULT_PATH):
+    "Same sheets as get_return_data, from the stored closes instead of a new download"
+    import numpy as np
+    import loaders
+    import pandas as pd
+    data = loaders.read_csv(f"{path}/0-closes.csv", 'closes', price=loaders.EXACT)
+    with pd.ExcelWriter(f'{path}/0-returns.xlsx') as writer:
+        data.to_excel(writer, sheet_name='closes')
+        np.log(data).diff().dropna().to_excel(writer, sheet_name='returns')
+        data.pct_change(fill_method=None).to_excel(writer, sheet_name='pct change')
+
+
+def build_frontier(changed, path=DEFAULT_PATH, dividends_path=DIVIDENDS_PATH):
+    "Max Sharpe and min volatility allocations over the whole stored history"
+    import portfolio_analysis
+    import price_sources
+    returns = price_sources.BarStoreSource(path, dividends_path).returns()
+    portfolio_analysis.batch_optimize([{'name': 'all'}], returns, workers=1).to_csv(f"{path}/0-frontier.csv", index=False)
+
+
+def build_bars_adj(changed, barpath='data/bars', splitpath='data/splits', divpath='data/divs', outdir='data/bars_adj'):
+    """
+    Combines and split adjusts the bars of the symbols whose bar, split or dividend file changed.
+    fix_splits corrects the split files in place and is run by hand before building
+    """
+    import polygon_api
+    os.makedirs(outdir, exist_ok=True)
+    if changed is None:
+        polygon_api.combine_bars(barpath, splitpath, divpath, outdir, workers=1)
+        polygon_api.adj_bars(outdir, workers=1)
+        return
+    for symbol in sorted({os.path.basename(file)[:-4] for file in changed}):
+        if os.path.exists(f"{barpath}/{symbol}.csv"):
+            polygon_api.combine_symbol_bars(symbol, barpath, splitpath, divpath, outdir)
+            polygon_api.adj_bar_file(f"{symbol}.csv", outdir)
+        elif os.path.exists(f"{outdir}/{symbol}.csv"):
+            os.remove(f"{outdir}/{symbol}.csv")
+
+
+def default_graph(path=DEFAULT_PATH, dividends_path=DIVIDENDS_PATH, polygon_path='data', manifest=MANIFEST):
+    """
+    The derived files of this repository: closes, summary, correlation, returns workbook and
+    frontier for one price folder, and the adjusted bars of the polygon_api pipeline
+    """
+    bars = f"{path}/{BAR_FILES}"
+    return (BuildGraph(manifest)
+            .add('closes', f"{path}/0-closes.csv", [bars], partial(build_closes, path=path))
+            .add('summary', f"{path}/0-summary.csv", [bars], partial(build_summary, path=path))
+            .add('correlation', f"{path}/0-correlation.csv", [], partial(build_correlation, path=path), deps=['closes'])
+            .add('returns', f"{path}/0-returns.xlsx", [], partial(build_returns_workbook, path=path), deps=['closes'])
+            .add('frontier', f"{path}/0-frontier.csv", [bars, f"{dividends_path}/*_div.csv"],
+                 partial(build_frontier, path=path, dividends_path=dividends_path))
+            .add('bars_adj', f"{polygon_path}/bars_adj/*.csv",
+                 [f"{polygon_path}/bars/*.csv", f"{polygon_path}/splits/*.csv", f"{polygon_path}/divs/*.csv"],
+                 partial(build_bars_adj, barpath=f"{polygon_path}/bars", splitpath=f"{polygon_path}/splits",
+                         divpath=f"{polygon_path}/divs", outdir=f"{polygon_path}/bars_adj")))
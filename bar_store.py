@@ -0,0 +1,132 @@
+"""
+Local bar store: the per-ticker price csv files written by get_price_data
+"""
+
+import io
+import os
+from functools import partial
+import pandas as pd
+import loaders
+from parallel import parallel_map
+
+DEFAULT_PATH = 'Data/Price_Data/Energy_S&P500'
+BAR_COLUMNS = ['o', 'h', 'l', 'c', 'v', 'vw', 'n']
+
+
+def list_tickers(path=DEFAULT_PATH):
+    """
+    Returns the tickers stored in path (derived files starting with '0' are skipped)
+    """
+    return sorted(file[:-4] for file in os.listdir(path)
+                  if file.endswith('.csv') and not file.startswith('0'))
+
+
+def source_signature(path=DEFAULT_PATH):
+    """
+    Returns a (file, size, mtime) tuple for every bar file in path,
+    changes whenever a file is added, rewritten or appended to
+    """
+    signature = []
+    for ticker in list_tickers(path):
+        stat = os.stat(f"{path}/{ticker}.csv")
+        signature.append((ticker, stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def read_bars(ticker, path=DEFAULT_PATH, columns=None, price=loaders.PRICE):
+    """
+    Returns the bars of one ticker with a datetime 't' column and float32 prices
+    (price=loaders.EXACT for float64), only the given columns when columns is set
+    """
+    return loaders.read_csv(f"{path}/{ticker}.csv", 'bars', columns, price)
+
+
+def read_tail(ticker, rows, path=DEFAULT_PATH):
+    """
+    Returns the last rows bars of one ticker with float64 prices, reading only the end of the file
+    """
+    file = f"{path}/{ticker}.csv"
+    with open(file, 'rb') as f:
+        header = f.readline()
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        block = 1 << 14
+        position = end
+        data = b''
+        # Walk back from the end until enough lines are buffered
+        while position > len(header) and data.count(b'\n') <= rows:
+            position = max(len(header), position - block)
+            f.seek(position)
+            data = f.read(end - position)
+
+    lines = data.splitlines()[-rows:]
+    return loaders.read_csv(io.BytesIO(header + b'\n'.join(lines)), 'bars', price=loaders.EXACT)
+
+
+def load_bars(path=DEFAULT_PATH, tickers=None, workers=1, columns=None, price=loaders.PRICE):
+    """
+    Returns the bars of all (or the selected) tickers in path as one long frame
+    sorted by ticker and 't', only the given columns when columns is set.
+    workers > 1 (or None for all cores) reads the files in parallel
+    """
+    if tickers is None:
+        tickers = list_tickers(path)
+
+    report = parallel_map(partial(read_bars, path=path, columns=columns, price=price), tickers, workers=workers,
+                          name='bar files')
+    if not report.ok:
+        print(report)
+
+    frames = []
+    for ticker in tickers:
+        if ticker in report.results:
+            bars = report.results[ticker]
+            bars['ticker'] = ticker
+            frames.append(bars)
+
+    if not frames:
+        return pd.DataFrame(columns=['ticker', 't'] + (BAR_COLUMNS if columns is None else
+                                                       [column for column in columns if column != 't']))
+
+    bars = pd.concat(frames, ignore_index=True)
+    bars['ticker'] = bars['ticker'].astype('category')
+    return bars.sort_values(['ticker', 't'], ignore_index=True)
+
+
+def iter_bars(path=DEFAULT_PATH, tickers=None, workers=1, columns=None, memory_limit=None, price=loaders.PRICE):
+    """
+    Yields load_bars frames for consecutive batches of tickers, each batch at most memory_limit
+    bytes of csv (default loaders.MEMORY_LIMIT), so a whole-universe pass holds one batch at a time.
+    The in-memory frame of a batch is smaller than its files: float32 prices and only the given columns
+    """
+    selected = set(tickers) if tickers is not None else None
+    sizes = [(ticker, size) for ticker, size, _ in source_signature(path) if selected is None or ticker in selected]
+    for batch in loaders.batches(sizes, memory_limit):
+        yield load_bars(path, batch, workers, columns, price)
+
+
+def append_bars(ticker, new_bars, path=DEFAULT_PATH):
+    """
+    Appends bars newer than the last stored 't' to the ticker's file
+    """
+    file = f"{path}/{ticker}.csv"
+    new_bars = new_bars.copy()
+    new_bars['t'] = pd.to_datetime(new_bars['t'])
+
+    if os.path.exists(file):
+        stored = read_bars(ticker, path, columns=['t'])
+        new_bars = new_bars[new_bars['t'] > stored['t'].max()]
+        start = len(stored)
+    else:
+        start = 0
+
+    if new_bars.empty:
+        return 0
+
+    new_bars.index = range(start, start + len(new_bars))
+    if (new_bars['t'] == new_bars['t'].dt.normalize()).all():
+        # Daily bars are stored as plain dates, intraday bars keep their time
+        new_bars['t'] = new_bars['t'].dt.date
+    columns = [column for column in ['v', 'vw', 'o', 'c', 'h', 'l', 't', 'n'] if column in new_bars]
+    new_bars[columns].to_csv(file, mode='a', header=start == 0)
+    return len(new_bars)
@@ -0,0 +1,149 @@
+"""
+Dividend analytics for the whole universe: trailing yield, growth, upcoming ex-dates
+and dividend reinvested total return
+"""
+
+import datetime as dt
+import os
+import numpy as np
+import pandas as pd
+import bar_store
+import loaders
+import resample
+import trading_calendar
+
+DIVIDENDS_PATH = 'Data/Dividends_Data/Energy_S&P500'
+DATE_COLUMNS = loaders.SCHEMAS['dividends']['dates']
+
+
+def load_dividends(path=DIVIDENDS_PATH):
+    """
+    Returns every dividend event in path as one table sorted by ticker and ex-date
+    """
+    frames = [loaders.read_csv(f"{path}/{file}", 'dividends') for file in sorted(os.listdir(path))
+              if file.endswith('_div.csv')]
+    divs = pd.concat(frames, ignore_index=True)
+    # Each file has its own ticker categories, concat falls back to strings
+    divs['ticker'] = divs['ticker'].astype('category')
+    return divs.sort_values(['ticker', 'ex_dividend_date'], ignore_index=True)
+
+
+def trailing_dividends(divs, dates, tickers, window=365):
+    """
+    Returns a (dates x tickers) frame with the sum of cash dividends that went ex in the
+    window calendar days up to and including each date
+    """
+    codes = pd.Categorical(divs['ticker'], categories=tickers).codes
+    divs = divs[codes >= 0]
+    codes = codes[codes >= 0].astype(np.int64)
+
+    # One sorted key per event: ticker code in the high part, ex-date day number in the low part,
+    # so a single searchsorted finds the window bounds for every ticker at once
+    span = 1 << 32
+    event_days = divs['ex_dividend_date'].values.astype('datetime64[D]').astype(np.int64)
+    keys = codes * span + event_days
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    cumulative = np.concatenate([[0.0], np.cumsum(divs['cash_amount'].to_numpy(dtype=float)[order])])
+
+    days = pd.DatetimeIndex(dates).values.astype('datetime64[D]').astype(np.int64)
+    base = np.arange(len(tickers), dtype=np.int64) * span
+    upper = np.searchsorted(keys, base[None, :] + days[:, None], side='right')
+    lower = np.searchsorted(keys, base[None, :] + days[:, None] - window, side='right')
+    return pd.DataFrame(cumulative[upper] - cumulative[lower], index=dates, columns=tickers)
+
+
+def trailing_yield(closes=None, divs=None, window=365):
+    """
+    Returns the trailing 12 month dividend yield for every stored close
+    """
+    if closes is None:
+        closes = trading_calendar.aligned_prices(bar_store.DEFAULT_PATH, 'c', fill='ffill')
+    if divs is None:
+        divs = load_dividends()
+    ttm = trailing_dividends(divs, closes.index, closes.columns, window)
+    return ttm / closes
+
+
+def dividend_growth(divs=None, freq='YE', as_of=None):
+    """
+    Returns total dividends per ticker and period (a resample period name or pandas offset)
+    with the growth against the prior period. Periods not yet complete on as_of (default today) are left out
+    """
+    if divs is None:
+        divs = load_dividends()
+    totals = (divs.groupby(['ticker', pd.Grouper(key='ex_dividend_date', freq=resample.period_offset(freq))],
+                           observed=True)['cash_amount'].sum().rename('dividends').reset_index())
+    totals = totals[totals['ex_dividend_date'] <= pd.Timestamp(as_of or dt.date.today())]
+    totals['growth'] = totals.groupby('ticker', observed=True)['dividends'].pct_change()
+    return totals.rename(columns={'ex_dividend_date': 'period'})
+
+
+def upcoming_ex_dates(divs=None, start=None, days=30):
+    """
+    Returns the dividends going ex in the next days calendar days, soonest first
+    """
+    if divs is None:
+        divs = load_dividends()
+    start = pd.Timestamp(start or dt.date.today())
+    upcoming = divs[(divs['ex_dividend_date'] >= start) &
+                    (divs['ex_dividend_date'] < start + pd.Timedelta(days=days))]
+    return upcoming.sort_values(['ex_dividend_date', 'ticker'], ignore_index=True)[
+        ['ticker', 'ex_dividend_date', 'pay_date', 'cash_amount', 'frequency', 'dividend_type']]
+
+
+def total_return_index(closes=None, divs=None, base=100):
+    """
+    Returns a dividend reinvested total return index per ticker: each day grows by
+    (close + dividend going ex that day) / previous close
+    """
+    if closes is None:
+        closes = trading_calendar.aligned_prices(bar_store.DEFAULT_PATH, 'c', fill='ffill')
+    if divs is None:
+        divs = load_dividends()
+
+    calendar = trading_calendar.TradingCalendar(closes.index)
+    # Ex-dates on non-trading days are reinvested on the next trading day
+    cash = calendar.to_matrix(divs, 'cash_amount', date_col='ex_dividend_date', how='next', fill=0, agg='sum')
+    cash = cash.reindex(columns=closes.columns, fill_value=0).to_numpy()
+
+    prices = closes.to_numpy(dtype=float)
+    valid = ~np.isnan(prices)
+    # Missing closes (unfilled calendars) compound from the last valid close, and dividends going
+    # ex on such a day are reinvested on the next valid one: each valid day takes the cash since the previous
+    filled = pd.DataFrame(prices).ffill().to_numpy()
+    paid = np.cumsum(cash, axis=0)
+    before = pd.DataFrame(np.where(valid, paid, np.nan)).ffill().shift(1).to_numpy()
+    cash = np.where(valid, paid - before, 0)
+
+    growth = np.ones_like(prices)
+    growth[1:] = (filled[1:] + cash[1:]) / filled[:-1]
+    # Days up to a ticker's first close leave the index unchanged
+    growth[np.isnan(growth)] = 1
+    index = base * np.cumprod(growth, axis=0)
+    index[np.isnan(prices)] = np.nan
+    return pd.DataFrame(index, index=closes.index, columns=closes.columns)
+
+
+def dividend_summary(closes=None, divs=None):
+    """
+    Returns one row per ticker: trailing 12 month dividends and yield, last ex-date and latest annual growth
+    """
+    if closes is None:
+        closes = trading_calendar.aligned_prices(bar_store.DEFAULT_PATH, 'c', fill='ffill')
+    if divs is None:
+        divs = load_dividends()
+
+    last = closes.iloc[[-1]]
+    ttm = trailing_dividends(divs, last.index, closes.columns).iloc[0]
+    growth = dividend_growth(divs, as_of=last.index[0]).groupby('ticker', observed=True)['growth'].last()
+    last_ex = divs.groupby('ticker', observed=True)['ex_dividend_date'].max()
+    last_ex.index = last_ex.index.astype(str)
+    growth.index = growth.index.astype(str)
+
+    return pd.DataFrame({
+        'ttm_dividends': ttm,
+        'ttm_yield': ttm / last.iloc[0],
+        'last_ex_date': last_ex,
+        'annual_growth': growth,
+    }).rename_axis('ticker')
@@ -0,0 +1,80 @@
+"""
+One pooled HTTP session shared by every downloader: keep-alive connections,
+retries with backoff on https (including 429 with Retry-After) and default timeouts
+"""
+
+import os
+from functools import lru_cache
+
+# Connections kept open per host, match the number of threads/workers downloading at once
+POOL_SIZE = int(os.environ.get('STOCK_ANALYSIS_POOL_SIZE', 10))
+# (connect, read) timeout in seconds
+TIMEOUT = (5, 30)
+RETRIES = 5
+BACKOFF = 0.5
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+_sessions = {}
+
+
+@lru_cache(maxsize=None)
+def timeout_adapter():
+    """
+    Returns the TimeoutAdapter class, an HTTPAdapter applying a default timeout to requests
+    sent without one. Built on first use so requests is only imported once something downloads
+    """
+    from requests.adapters import HTTPAdapter
+
+    class TimeoutAdapter(HTTPAdapter):
+        def __init__(self, timeout=TIMEOUT, **kwargs):
+            self.timeout = timeout
+            super().__init__(**kwargs)
+
+        def send(self, request, **kwargs):
+            if kwargs.get('timeout') is None:
+                kwargs['timeout'] = self.timeout
+            return super().send(request, **kwargs)
+
+    return TimeoutAdapter
+
+
+def make_session(pool_size=POOL_SIZE, retries=RETRIES, backoff=BACKOFF):
+    """
+    Returns a Session with a pooled, retrying adapter with default timeouts mounted on both
+    http:// and https://
+    """
+    import requests
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUS,
+                  allowed_methods=['GET'], respect_retry_after_header=True)
+    adapter = timeout_adapter()(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """
+    Returns this process's shared session, worker processes each get their own pool
+    """
+    pid = os.getpid()
+    if pid not in _sessions:
+        _sessions[pid] = make_session()
+    return _sessions[pid]
+
+
+def get(url, timeout=TIMEOUT, **kwargs):
+    """
+    GET through the shared session with a default timeout
+    """
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+
+def configure(pool_size=POOL_SIZE, retries=RETRIES, backoff=BACKOFF):
+    """
+    Replaces this process's shared session, e.g. with a pool sized to the download concurrency
+    """
+    _sessions[os.getpid()] = make_session(pool_size, retries, backoff)
+    return _sessions[os.getpid()]
@@ -0,0 +1,192 @@
+"""
+Interactive plotly charts for long histories, downsampled to display resolution
+and drawn with WebGL traces once series get large
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import bar_store
+
+# Points kept per trace, roughly the pixel width of a chart
+MAX_POINTS = 2000
+# Traces with more points than this use Scattergl instead of the SVG Scatter
+WEBGL_THRESHOLD = 1000
+
+
+def lttb(x, y, threshold=MAX_POINTS):
+    """
+    Largest-Triangle-Three-Buckets downsampling, returns the indices of the points kept
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Point in this bucket forming the largest triangle with the last kept point and the next bucket's average
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[bucket + 1] = a
+    return keep
+
+
+def minmax(y, threshold=MAX_POINTS):
+    """
+    Min/max downsampling: keeps the lowest and highest point of each bucket, returns their indices
+    """
+    n = len(y)
+    if threshold >= n:
+        return np.arange(n)
+
+    # Two points per bucket plus both endpoints stay within threshold
+    buckets = max(1, (threshold - 2) // 2)
+    size = -(-n // buckets)
+    # Pad the last bucket so it never wins either reduction
+    low = np.full(buckets * size, np.inf)
+    low[:n] = y
+    high = np.full(buckets * size, -np.inf)
+    high[:n] = y
+    offsets = np.arange(buckets) * size
+    lo = offsets + np.argmin(low.reshape(buckets, size), axis=1)
+    hi = offsets + np.argmax(high.reshape(buckets, size), axis=1)
+    keep = np.unique(np.concatenate([lo, hi, [0, n - 1]]))
+    return keep[keep < n]
+
+
+def downsample(series, threshold=MAX_POINTS, method='lttb'):
+    """
+    Returns series reduced to about threshold points, NaNs removed
+    """
+    series = series.dropna()
+    if method == 'minmax':
+        keep = minmax(series.to_numpy(dtype=float), threshold)
+    else:
+        x = pd.DatetimeIndex(series.index).asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+        keep = lttb(x, series.to_numpy(dtype=float), threshold)
+    return series.iloc[keep]
+
+
+def line_trace(series, name, threshold=MAX_POINTS, method='lttb', **kwargs):
+    """
+    Returns a plotly line trace of the downsampled series, WebGL backed for large series
+    """
+    data = downsample(series, threshold, method)
+    trace = go.Scattergl if len(data) > WEBGL_THRESHOLD else go.Scatter
+    return trace(x=data.index, y=data.to_numpy(), name=name, mode='lines', **kwargs)
+
+
+def performance_figure(closes, relative=True, threshold=MAX_POINTS, method='lttb'):
+    """
+    Returns an interactive chart of absolute or relative closes, one trace per column
+    """
+    if relative:
+        closes = closes / closes.bfill().iloc[0] - 1
+    fig = go.Figure([line_trace(closes[ticker], ticker, threshold, method) for ticker in closes.columns])
+    fig.update_layout(yaxis=dict(tickformat='.0%' if relative else None), hovermode='x')
+    if relative:
+        fig.add_hline(0, line=dict(color='red', dash='dash'))
+    return fig
+
+
+def returns_histogram(returns, bins=50, title=None):
+    """
+    Returns a histogram of returns binned with numpy, so only the bin counts reach the browser
+    """
+    fig = go.Figure()
+    for ticker in returns.columns:
+        data = returns[ticker].dropna().to_numpy()
+        counts, edges = np.histogram(data, bins=bins)
+        fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                             name=ticker, opacity=0.75))
+    fig.update_layout(barmode='overlay', title=title, xaxis=dict(tickformat='.1%'))
+    return fig
+
+
+def frontier_figure(max_SR, min_Vol, efficient_std, target_returns, portfolios=None):
+    """
+    Returns the efficient frontier chart; max_SR and min_Vol are (std, return) points in %,
+    portfolios an optional (std, return) cloud of simulated portfolios
+    """
+    data = []
+    if portfolios is not None:
+        std, ret = np.asarray(portfolios[0]), np.asarray(portfolios[1])
+        trace = go.Scattergl if len(std) > WEBGL_THRESHOLD else go.Scatter
+        data.append(trace(name='Portfolios', mode='markers', x=std, y=ret,
+                          marker=dict(color='lightgrey', size=4)))
+
+    data += [
+        go.Scatter(name='Maximum Sharpe Ratio', mode='markers', x=[max_SR[0]], y=[max_SR[1]],
+                   marker=dict(color='red', size=14, line=dict(width=3, color='black'))),
+        go.Scatter(name='Minimum Volatility', mode='markers', x=[min_Vol[0]], y=[min_Vol[1]],
+                   marker=dict(color='green', size=14, line=dict(width=3, color='black'))),
+        go.Scatter(name='Efficient Frontier', mode='lines',
+                   x=[round(ef_std * 100, 2) for ef_std in efficient_std],
+                   y=[round(target * 100, 2) for target in target_returns],
+                   line=dict(color='black', width=4, dash='dashdot')),
+    ]
+
+    layout = go.Layout(
+        title='Porfolio Optimization with Efficient Frontier',
+        yaxis=dict(title='Annualized Return (%)'),
+        xaxis=dict(title='Annualized Volatility (%)'),
+        showlegend=True,
+        legend=dict(
+            x=0.75, y=0, traceorder='normal',
+            bgcolor='#E2E2E2',
+            bordercolor='black',
+            borderwidth=2),
+        width=800,
+        height=600)
+    return go.Figure(data=data, layout=layout)
+
+
+def load_range(tickers=None, start=None, end=None, path=bar_store.DEFAULT_PATH):
+    """
+    Returns full resolution closes for a date range from the local store, reading only
+    the tickers asked for and only their 't' and 'c' columns
+    """
+    bars = bar_store.load_bars(path, tickers, columns=['t', 'c'])
+    if start is not None:
+        bars = bars[bars['t'] >= pd.Timestamp(start)]
+    if end is not None:
+        bars = bars[bars['t'] <= pd.Timestamp(end)]
+    closes = bars.pivot(index='t', columns='ticker', values='c')
+    return closes[list(tickers)] if tickers is not None else closes
+
+
+def zoomable_figure(closes, relative=True, threshold=MAX_POINTS, method='lttb', loader=None):
+    """
+    Returns a FigureWidget (Jupyter) that re-downsamples from full resolution data whenever
+    the x range changes, so zooming in reveals detail. loader(tickers, start, end) can fetch
+    that detail from the local store instead of keeping closes in memory, e.g. load_range
+    """
+    fig = go.FigureWidget(performance_figure(closes, relative, threshold, method))
+    tickers = list(closes.columns)
+    # Keep the baseline of the full history rather than the zoomed window
+    baseline = closes.bfill().iloc[0]
+    # With a loader only the tickers and baseline stay referenced, the closes can be freed
+    full = None if loader else closes
+
+    def on_zoom(layout, x_range):
+        start, end = (None, None) if x_range is None else x_range
+        detail = loader(tickers, start, end) if loader else full.loc[start:end]
+        if relative:
+            detail = detail / baseline - 1
+        with fig.batch_update():
+            for trace in fig.data:
+                data = downsample(detail[trace.name], threshold, method)
+                trace.x, trace.y = data.index, data.to_numpy()
+
+    fig.layout.on_change(on_zoom, 'xaxis.range')
+    return fig
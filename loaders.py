@@ -0,0 +1,100 @@
+"""
+Memory efficient csv loading: a schema per dataset (float32 prices, categorical labels,
+datetime64 dates), column projection and batched reads under a memory ceiling
+"""
+
+import os
+from collections import defaultdict
+import pandas as pd
+
+# Bytes of data a batched pass holds at once, override with STOCK_ANALYSIS_MEMORY_LIMIT
+MEMORY_LIMIT = int(os.environ.get('STOCK_ANALYSIS_MEMORY_LIMIT', 2 * 1024 ** 3))
+# float32 keeps about 7 significant digits, prices stay exact to the cent below $80,000.
+# Only for in-memory analysis: float32 values cast to float64 print as 43.54999923706055,
+# so reads whose prices are written back to files or workbooks pass price=EXACT
+PRICE = 'float32'
+EXACT = 'float64'
+
+SCHEMAS = {
+    # Local bar store written by get_price_data
+    'bars': {'index_col': 0, 'dates': ['t'], 'prices': ['o', 'h', 'l', 'c', 'vw'],
+             # Trade counts pass 2**24 on liquid names, where float32 stops counting every trade
+             'dtype': {'v': 'float64', 'n': 'float64'}},
+    # Closes written by get_closing_prices, one price column per ticker ('*': every other column)
+    'closes': {'index_col': 0, 'dates': ['t'], 'prices': '*',
+               'dtype': {'t': object, 'Unnamed: 0': 'int64'}},
+    # Dividends written by get_dividends
+    'dividends': {'index_col': 0, 'dates': ['declaration_date', 'ex_dividend_date', 'pay_date', 'record_date'],
+                  'dtype': {'ticker': 'category', 'currency': 'category', 'dividend_type': 'category',
+                            'cash_amount': 'float64', 'frequency': 'float32'}},
+    # News written by get_ticker_news
+    'news': {'index_col': 0, 'dates': ['published_utc'], 'dtype': {'author': 'category'}},
+    # Ticker list pages written by polygon_api.get_tickers
+    'tickers': {'dtype': {'market': 'category', 'locale': 'category', 'primaryExch': 'category',
+                          'type': 'category', 'currency': 'category'}},
+    # Unadjusted bars, splits and dividends of the polygon_api pipeline
+    'polygon_bars': {'dates': ['date'], 'prices': ['open', 'high', 'low', 'close'], 'dtype': {'volume': 'float64'}},
+    'splits': {'dates': ['date'], 'dtype': {'ticker': 'category', 'ratio': 'float64'}},
+    'divs': {'dates': ['date'], 'dtype': {'ticker': 'category', 'amount': 'float64'}},
+}
+
+
+def _dtype(schema, price):
+    prices = schema.get('prices', [])
+    if prices == '*':
+        return defaultdict(lambda: price, schema['dtype'])
+    return {**schema['dtype'], **{column: price for column in prices}}
+
+
+def _options(dataset, columns, price, kwargs):
+    """
+    pandas read_csv options for a dataset, projected onto columns (the index column is always kept)
+    """
+    schema = SCHEMAS[dataset]
+    options = {'dtype': _dtype(schema, price)}
+    if 'index_col' in schema:
+        options['index_col'] = schema['index_col']
+    options.update(kwargs)
+    if columns is not None:
+        keep = set(columns)
+        index = options.get('index_col')
+        if isinstance(index, str):
+            keep.add(index)
+        # The unnamed first column (position 0) is the row index of files written by to_csv
+        options['usecols'] = lambda name: name in keep or (index == 0 and name.startswith('Unnamed: 0'))
+    return options
+
+
+def _parse_dates(frame, dataset):
+    for column in SCHEMAS[dataset]['dates']:
+        if column in frame.columns:
+            frame[column] = pd.to_datetime(frame[column])
+        elif frame.index.name == column:
+            frame.index = pd.to_datetime(frame.index)
+    return frame
+
+
+def read_csv(file, dataset, columns=None, price=PRICE, **kwargs):
+    """
+    Reads one csv with the dataset's schema, only the given columns when columns is set.
+    price is the dtype of the price columns, EXACT when they are saved again.
+    Extra keyword arguments go to pandas.read_csv
+    """
+    return _parse_dates(pd.read_csv(file, **_options(dataset, columns, price, kwargs)), dataset)
+
+
+def batches(sizes, memory_limit=None):
+    """
+    Splits (item, size) pairs into consecutive lists of items whose sizes add up to at most
+    memory_limit, an item larger than the limit gets a batch of its own
+    """
+    memory_limit = memory_limit or MEMORY_LIMIT
+    batch, total = [], 0
+    for item, size in sizes:
+        if batch and total + size > memory_limit:
+            yield batch
+            batch, total = [], 0
+        batch.append(item)
+        total += size
+    if batch:
+        yield batch
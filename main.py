@@ -1,16 +1,232 @@
-# This is a sample Python script.
+"""
+Command line entry point:
 
-# Press ⌃R to execute it or replace it with your code.
-# Press Double ⇧ to search everywhere for classes, files, tool windows, actions, and settings.
+    python main.py download prices XOM CVX --path Data/Price_Data/Energy_S&P500
+    python main.py refresh
+    python main.py build
+    python main.py build-closes
+    python main.py adjust --bars data/bars --splits data/splits --divs data/divs
+    python main.py optimize XOM CVX COP --start 2021-01-01 --risk-free-rate 0.02
+    python main.py plot --period weekly
+    python main.py monitor --start 2022-06-01 --threshold 2
 
+Every subcommand imports what it needs when it runs, so data-only commands never load
+the plotting, Excel or HTTP libraries
+"""
 
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print(f'Hi, {name}')  # Press ⌘F8 to toggle the breakpoint.
+import argparse
+import os
 
+DEFAULT_PATH = 'Data/Price_Data/Energy_S&P500'
+
+
+def rebuild(path=None, dividends_path=None, workers=None):
+    import artifacts
+    artifacts.default_graph(path or DEFAULT_PATH, dividends_path or artifacts.DIVIDENDS_PATH).build(workers=workers)
+
+
+def download(args):
+    import polygon_api_new
+    tickers = args.tickers or list(polygon_api_new.get_sp(symbols=True, sector=args.sector))
+    # Each data type has its own folder, --path overrides it
+    path = {'path': args.path} if args.path else {}
+    if args.data == 'prices':
+        polygon_api_new.get_price_data(*tickers, key=args.key, start=args.start, end=args.end, **path)
+    elif args.data == 'dividends':
+        polygon_api_new.get_dividends(*tickers, key=args.key, start=args.start, **path)
+    elif args.data == 'news':
+        polygon_api_new.get_ticker_news(*tickers, key=args.key, start_date=args.start, **path)
+    else:
+        polygon_api_new.get_ticker_details(*tickers, key=args.key, **path)
+    if args.no_build:
+        return
+    if args.data == 'prices':
+        rebuild(args.path, workers=args.workers)
+    elif args.data == 'dividends':
+        # The dividends feed the frontier artifact of the default price folder
+        rebuild(dividends_path=args.path, workers=args.workers)
+
+
+def refresh(args):
+    import polygon_api_new
+    polygon_api_new.refresh_price_data(*args.tickers, key=args.key, path=args.path, end=args.end)
+    if not args.no_build:
+        rebuild(args.path, workers=args.workers)
+
+
+def build(args):
+    import artifacts
+    graph = artifacts.default_graph(args.path)
+    if args.list:
+        stale = graph.stale()
+        print("Stale artifacts: " + (', '.join(stale) if stale else 'none'))
+        return
+    graph.build(args.artifacts or None, workers=args.workers, force=args.force)
+
+
+def build_closes(args):
+    import polygon_api_new
+    polygon_api_new.get_closing_prices(args.path, workers=args.workers)
+
+
+def adjust(args):
+    import polygon_api
+    polygon_api.fix_splits(args.splits, args.corrections, workers=args.workers)
+    polygon_api.combine_bars(args.bars, args.splits, args.divs, args.out, workers=args.workers)
+    polygon_api.adj_bars(args.out, workers=args.workers)
+
+
+def optimize(args):
+    import portfolio_analysis
+    import price_sources
+    if args.closes:
+        source = price_sources.ClosesFileSource(args.closes)
+    else:
+        source = price_sources.BarStoreSource(args.path)
+    tickers = args.tickers or list(source.prices().columns)
+    mean_returns, cov_matrix = portfolio_analysis.get_data(tickers, args.start, args.end, source)
+    if args.plot:
+        return portfolio_analysis.EF_graph(mean_returns, cov_matrix, args.risk_free_rate, tuple(args.bounds))
+
+    results = portfolio_analysis.calculated_results(mean_returns, cov_matrix, args.risk_free_rate, tuple(args.bounds))
+    max_SR_returns, max_SR_std, max_SR_allocation, min_Vol_returns, min_Vol_std, min_Vol_allocation = results[:6]
+    print(f"Max Sharpe ratio: return {max_SR_returns}%, volatility {max_SR_std}%")
+    print(max_SR_allocation[max_SR_allocation.allocation != 0].T.to_string())
+    print(f"Min volatility: return {min_Vol_returns}%, volatility {min_Vol_std}%")
+    print(min_Vol_allocation[min_Vol_allocation.allocation != 0].T.to_string())
+
+
+def plot(args):
+    if args.interactive:
+        import interactive_charts
+        import resample
+        import trading_calendar
+        closes = (resample.resampled_closes(args.path, args.period) if args.period
+                  else trading_calendar.aligned_prices(args.path, 'c'))
+        return interactive_charts.performance_figure(closes).show()
+    if args.show:
+        import polygon_api_new
+        return polygon_api_new.plot_performance(args.path, args.period)
+    import plot_pipeline
+    if args.period:
+        import resample
+        closes = resample.resampled_closes(args.path, args.period)
+        files = plot_pipeline.render_performance(closes, args.outdir, workers=args.workers)
+        print(f"{len(files)} chart files written to {args.outdir}")
+    else:
+        plot_pipeline.render_path(args.path, args.outdir, workers=args.workers)
 
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
 
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+def monitor(args):
+    import asyncio
+    import streaming
+
+    def show(alert):
+        print(f"{alert['time']} {alert['ticker']}: {alert['c']:.2f} moved {alert['magnitude']:+.2f} "
+              f"expected changes ({alert['change']:+.2f} vs {alert['exp_change']:.2f})")
+
+    if args.live:
+        state = streaming.seed_from_store(streaming.RollingState(), args.path, args.tickers or None)
+        channels = ','.join(f"AM.{ticker}" for ticker in args.tickers) or 'AM.*'
+        monitor = streaming.Monitor(state, args.threshold, [show])
+        asyncio.run(monitor.run(streaming.polygon_messages(args.key, channels)))
+    else:
+        monitor = asyncio.run(streaming.replay(args.path, args.tickers or None, args.start, args.end, args.threshold,
+                                               args.port, args.interval, [show]))
+    print(f"{monitor.events} events, {monitor.alert_count} alerts")
+
+
+def parser():
+    parser = argparse.ArgumentParser(description="Stock data downloads, processing and analysis")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    key = argparse.ArgumentParser(add_help=False)
+    key.add_argument('--key', default=os.environ.get('API_KEY'), help="Polygon.io API key (default: $API_KEY)")
+    key.add_argument('--no-build', action='store_true', help="do not rebuild the derived files afterwards")
+    key.add_argument('--workers', type=int)
+
+    command = commands.add_parser('download', parents=[key], help="download data from Polygon.io")
+    command.add_argument('data', choices=['prices', 'dividends', 'news', 'details'])
+    command.add_argument('tickers', nargs='*', help="default: the S&P 500 members of --sector")
+    command.add_argument('--sector', default='Energy')
+    command.add_argument('--path', help="default: the folder of each data type (prices " + DEFAULT_PATH
+                                        + ", dividends Data/Dividends_Data/Energy_S&P500, news Data/Ticker_News, "
+                                        "details Data/Reference_Data)")
+    command.add_argument('--start', default='2019-01-01')
+    command.add_argument('--end', default='2022-07-12')
+    command.set_defaults(func=download)
+
+    command = commands.add_parser('refresh', parents=[key], help="append new bars to the stored prices")
+    command.add_argument('tickers', nargs='*', help="default: every stored ticker")
+    command.add_argument('--path', default=DEFAULT_PATH)
+    command.add_argument('--end', help="default: today")
+    command.set_defaults(func=refresh)
+
+    command = commands.add_parser('build', help="rebuild the derived files whose inputs changed")
+    command.add_argument('artifacts', nargs='*', help="default: all (closes, summary, correlation, returns, "
+                                                      "frontier, bars_adj)")
+    command.add_argument('--path', default=DEFAULT_PATH)
+    command.add_argument('--workers', type=int)
+    command.add_argument('--force', action='store_true', help="rebuild even if nothing changed")
+    command.add_argument('--list', action='store_true', help="only list the stale artifacts")
+    command.set_defaults(func=build)
+
+    command = commands.add_parser('build-closes', help="save the aligned closes as 0-closes.csv")
+    command.add_argument('--path', default=DEFAULT_PATH)
+    command.add_argument('--workers', type=int)
+    command.set_defaults(func=build_closes)
+
+    command = commands.add_parser('adjust', help="fix splits, combine bars with splits and dividends and adjust them")
+    command.add_argument('--bars', default='data/bars')
+    command.add_argument('--splits', default='data/splits')
+    command.add_argument('--divs', default='data/divs')
+    command.add_argument('--out', default='data/bars_adj')
+    command.add_argument('--corrections', default='split_corrections.csv')
+    command.add_argument('--workers', type=int)
+    command.set_defaults(func=adjust)
+
+    command = commands.add_parser('optimize', help="max Sharpe and min volatility portfolios")
+    command.add_argument('tickers', nargs='*', help="default: every stored ticker")
+    command.add_argument('--path', default=DEFAULT_PATH)
+    command.add_argument('--closes', help="closes file to use instead of the bar store")
+    command.add_argument('--start')
+    command.add_argument('--end')
+    command.add_argument('--risk-free-rate', type=float, default=0)
+    command.add_argument('--bounds', type=float, nargs=2, default=[0, 1], metavar=('LOWER', 'UPPER'))
+    command.add_argument('--plot', action='store_true', help="show the efficient frontier")
+    command.set_defaults(func=optimize)
+
+    command = commands.add_parser('plot', help="relative performance charts")
+    command.add_argument('--path', default=DEFAULT_PATH)
+    command.add_argument('--period', help="daily, weekly, monthly, quarterly, yearly or a pandas offset")
+    command.add_argument('--outdir', default='Charts')
+    command.add_argument('--workers', type=int)
+    command.add_argument('--show', action='store_true', help="show one figure instead of writing files")
+    command.add_argument('--interactive', action='store_true', help="show a plotly chart instead of writing files")
+    command.set_defaults(func=plot)
+
+    command = commands.add_parser('monitor', help="alert on moves beyond a number of expected changes, "
+                                                  "replaying the stored bars or from Polygon's websocket")
+    command.add_argument('tickers', nargs='*', help="default: every stored ticker")
+    command.add_argument('--path', default=DEFAULT_PATH)
+    command.add_argument('--start', help="first replayed date, earlier sessions seed the volatility")
+    command.add_argument('--end')
+    command.add_argument('--threshold', type=float, default=2.0, help="abs_magnitude that raises an alert")
+    command.add_argument('--port', type=int, default=8765, help="port of the local replay server")
+    command.add_argument('--interval', type=float, default=0.0, help="seconds between replayed messages")
+    command.add_argument('--live', action='store_true', help="stream minute aggregates from Polygon.io")
+    command.add_argument('--key', default=os.environ.get('API_KEY'), help="Polygon.io API key (default: $API_KEY)")
+    command.set_defaults(func=monitor)
+    return parser
+
+
+def main(argv=None):
+    cli = parser()
+    args = cli.parse_args(argv)
+    if (args.command in ('download', 'refresh') or getattr(args, 'live', False)) and not args.key:
+        cli.error("a Polygon.io API key is required, pass --key or set API_KEY")
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,10 @@
 import datetime as dt
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
 import numpy as np
-import requests
+import http_client
 import os
 import pandas as pd
-import seaborn as sb
-sb.set_theme()
+import bar_store
+import resample
 
 START_DATE = '2019-01-01'
 END_DATE = '2022-07-12'
@@ -14,24 +12,31 @@ DEFAULT_DATE = dt.date.today() - dt.timedelta(396)
 TODAY = dt.date.today()
 
 class Stock:
-    def __init__(self, ticker, key, adjusted=True, start=START_DATE, end=END_DATE, path=None):
+    def __init__(self, ticker, key, adjusted=True, start=START_DATE, end=END_DATE, path=None, period=None):
         self.ticker = ticker
         self.key = key
         self.adjusted = adjusted
         self.start = start
         self.end = end
         self.path = path
+        self.period = period
         self.data = self.get_data()
 
 
     def get_data(self):
         available_data = [filename[:-4] for filename in os.listdir(self.path)
                           if not filename.startswith('0')]
-        if self.ticker in available_data:
-            data = pd.read_csv(f"{self.path}/{self.ticker}", index_col='t').round(2)
+        if self.period and self.ticker in available_data:
+            # Weekly/monthly/custom bars come from the local store instead of another API call
+            data = resample.get_resampled(self.path, self.period).loc[self.ticker].astype('float64').round(2)
+            data.index = data.index.date
+            self.calc_vol(data)
+        elif self.ticker in available_data:
+            data = bar_store.read_bars(self.ticker, self.path).set_index('t').astype('float64').round(2)
+            data.index = data.index.date
         else:
             endpoint = f"https://api.polygon.io/v2/aggs/ticker/{self.ticker}/range/1/day/{self.start}/{self.end}?adjusted={self.adjusted}&sort=asc&limit=50000&apiKey={self.key}"
-            call = requests.get(endpoint).json()
+            call = http_client.get(endpoint).json()
             data = pd.DataFrame(call["results"]).round(2)
             data.index = pd.to_datetime(data['t'], unit='ms').dt.date
             data.drop(columns=['t'], inplace=True)
@@ -49,9 +54,21 @@ class Stock:
         df['abs_magnitude'] = np.abs(df.magnitude)
         df.dropna(inplace=True)
 
-    def plot_return_data(self):
+    def plot_return_data(self, interactive=False):
+        """
+        Histogram of the returns, interactive=True opens a plotly chart binned with numpy instead
+        """
         start = self.data.index[0]
         end = self.data.index[-1]
+        if interactive:
+            import interactive_charts
+            returns = self.data[['returns']].rename(columns={'returns': self.ticker})
+            title = f"Distribution of returns for {self.ticker} from {start} to {end}"
+            return interactive_charts.returns_histogram(returns, bins=20, title=title).show()
+        # Plotting libraries load on first plot, data-only use of Stock never pays for them
+        import matplotlib.pyplot as plt
+        import seaborn as sb
+        sb.set_theme()
         plt.hist(self.data['returns'], bins=20, edgecolor='w')
         plt.suptitle(f"Distribution of returns for {self.ticker}", fontsize=14)
         plt.title(f"From {start} to {end}", fontsize=12)
@@ -0,0 +1,121 @@
+"""
+Process pool map for per-ticker work: chunked scheduling, shared memory arrays
+and an error report instead of printing failures
+"""
+
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+# Worker count used when none is given, override with the STOCK_ANALYSIS_WORKERS environment variable
+WORKERS = int(os.environ.get('STOCK_ANALYSIS_WORKERS', os.cpu_count() or 1))
+# Chunks scheduled per worker, more chunks balance uneven files better at the cost of overhead
+CHUNKS_PER_WORKER = 4
+
+
+class Report:
+    """
+    Results and errors of a parallel_map run, keyed by item
+    """
+    def __init__(self, name='items'):
+        self.name = name
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __len__(self):
+        return len(self.results)
+
+    def __str__(self):
+        message = f"{len(self.results)} {self.name} processed, {len(self.errors)} failed"
+        for item, error in self.errors.items():
+            message += f"\n  {item}: {error.splitlines()[-1]}"
+        return message
+
+    __repr__ = __str__
+
+
+def _run_chunk(func, chunk):
+    done = []
+    for item in chunk:
+        try:
+            done.append((item, True, func(item)))
+        except Exception:
+            done.append((item, False, traceback.format_exc()))
+    return done
+
+
+def parallel_map(func, items, workers=None, chunksize=None, name='items'):
+    """
+    Calls func(item) for every item across worker processes and returns a Report.
+    func must be a module level function (or functools.partial of one) and items should be
+    small, e.g. file paths or tickers, with large arrays passed through SharedArray
+    """
+    items = list(items)
+    workers = min(workers or WORKERS, max(1, len(items)))
+    if chunksize is None:
+        chunksize = max(1, len(items) // (workers * CHUNKS_PER_WORKER))
+    chunks = [items[start:start + chunksize] for start in range(0, len(items), chunksize)]
+
+    report = Report(name)
+    if workers == 1:
+        done = (_run_chunk(func, chunk) for chunk in chunks)
+        _collect(report, done)
+        return report
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        _collect(report, executor.map(_run_chunk, [func] * len(chunks), chunks))
+    return report
+
+
+def _collect(report, done):
+    for chunk in done:
+        for item, ok, value in chunk:
+            if ok:
+                report.results[item] = value
+            else:
+                report.errors[item] = value
+
+
+class SharedArray:
+    """
+    A numpy array in shared memory. Pass .handle to workers and open it there with
+    SharedArray.attach, so the data is mapped instead of pickled per task
+    """
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)
+        self.array[...] = array
+        self.handle = (self._shm.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(handle):
+        name, shape, dtype = handle
+        shm = _attached.get(name)
+        if shm is None:
+            shm = _attached[name] = shared_memory.SharedMemory(name=name)
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+    def close(self):
+        self.array = None
+        attached = _attached.pop(self._shm.name, None)
+        if attached is not None:
+            attached.close()
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Segments opened by this (worker) process, kept open for the worker's lifetime
+_attached = {}
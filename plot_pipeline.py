@@ -0,0 +1,106 @@
+"""
+Headless rendering of relative performance grids for many tickers
+"""
+
+import math
+import os
+from functools import partial
+import numpy as np
+import pandas as pd
+import matplotlib.dates as mdates
+import matplotlib.ticker as mtick
+from matplotlib.figure import Figure
+import bar_store
+import trading_calendar
+from parallel import SharedArray, parallel_map
+
+COLUMNS = 4
+PER_PAGE = 16
+PANEL_SIZE = (4, 3)
+
+
+def relative_performance(closes):
+    """
+    Returns the % change of every column against its first available close
+    """
+    values = closes.to_numpy(dtype=float)
+    first = values[np.argmax(~np.isnan(values), axis=0), np.arange(values.shape[1])]
+    return pd.DataFrame((values / first - 1) * 100, index=closes.index, columns=closes.columns)
+
+
+def grid_shape(count, columns=COLUMNS):
+    """
+    Returns (rows, columns) for a grid holding count panels
+    """
+    columns = max(1, min(columns, count))
+    return math.ceil(count / columns), columns
+
+
+def draw_performance(axes, performance):
+    """
+    Draws one relative performance panel per column of performance onto axes
+    """
+    axes = np.atleast_1d(axes).ravel()
+    x = mdates.date2num(pd.DatetimeIndex(performance.index))
+    for ax, ticker in zip(axes, performance.columns):
+        ax.plot(x, performance[ticker].to_numpy(), lw=1)
+        # A plain title is much cheaper to lay out than a legend box
+        ax.set_title(ticker, fontsize=9, loc='left')
+        ax.yaxis.set_major_formatter(mtick.PercentFormatter())
+        ax.axhline(0, c='r', ls='--', lw=1)
+        ax.xaxis.set_major_locator(mdates.AutoDateLocator(minticks=3, maxticks=6))
+        ax.xaxis.set_major_formatter(mdates.DateFormatter('%b %y'))
+        ax.tick_params(labelsize=7, labelbottom=True)
+    # Hide the panels left over on the last row
+    for ax in axes[len(performance.columns):]:
+        ax.set_visible(False)
+
+
+def _render_page(page, handle, dates, tickers, columns, dpi):
+    start, stop, file = page
+    # The performance matrix is mapped from shared memory, only the page bounds travel per task
+    values = SharedArray.attach(handle)[:, start:stop]
+    performance = pd.DataFrame(values, index=dates, columns=tickers[start:stop])
+    rows, columns = grid_shape(len(performance.columns), columns)
+    # Figure without pyplot renders through the Agg canvas, no display or backend switch needed.
+    # Fixed margins instead of a layout engine, which would measure every tick label
+    width, height = PANEL_SIZE[0] * columns, PANEL_SIZE[1] * rows
+    fig = Figure(figsize=(width, height))
+    axes = fig.subplots(rows, columns, squeeze=False, sharex=True)
+    draw_performance(axes, performance)
+    fig.subplots_adjust(left=0.6 / width, right=1 - 0.2 / width, bottom=0.4 / height, top=1 - 0.3 / height,
+                        hspace=0.35, wspace=0.3)
+    fig.savefig(file, dpi=dpi)
+    return file
+
+
+def render_performance(closes, outdir, per_page=PER_PAGE, columns=COLUMNS, fmt='png', dpi=100,
+                       workers=None, prefix='performance'):
+    """
+    Renders relative performance grids of per_page tickers each to outdir, spreading the
+    pages over worker processes (workers=1 renders in this process). Returns the files written
+    """
+    os.makedirs(outdir, exist_ok=True)
+    performance = relative_performance(closes)
+
+    pages = []
+    for page, start in enumerate(range(0, len(performance.columns), per_page), start=1):
+        pages.append((start, start + per_page, f"{outdir}/{prefix}-{page:03d}.{fmt}"))
+
+    with SharedArray(performance.to_numpy()) as shared:
+        render = partial(_render_page, handle=shared.handle, dates=performance.index,
+                         tickers=list(performance.columns), columns=columns, dpi=dpi)
+        report = parallel_map(render, pages, workers=workers, chunksize=1, name='chart pages')
+    if not report.ok:
+        print(report)
+    return [report.results[page] for page in pages if page in report.results]
+
+
+def render_path(path=bar_store.DEFAULT_PATH, outdir='Charts', **kwargs):
+    """
+    Renders performance grids for every ticker stored in path
+    """
+    closes = trading_calendar.aligned_prices(path, 'c')
+    files = render_performance(closes, outdir, **kwargs)
+    print(f"{len(files)} chart files written to {outdir}")
+    return files
@@ -1,13 +1,12 @@
 # %%
 # I'm using my base conda environment for this given the simple requirements
-import requests
+import http_client
 import pandas as pd
-import matplotlib
 import os
 import math
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from polygon import RESTClient
+from functools import partial
+import loaders
+from parallel import parallel_map
 
 # %%
 # Set some constant variables, I could put all of this in a separate config file
@@ -26,14 +25,12 @@ POLYGON_SPLIT_URL = 'https://api.polygon.io/v2/reference/splits/{}?apiKey={}'
 # URL FOR TICKER TYPES
 POLYGON_TYPES_URL = 'https://api.polygon.io/v2/reference/types?apiKey={}'
 
-client = RESTClient(API_KEY)
-
 # %%
 # Get the list of all supported tickers from Polygon.io
 def get_tickers(url = POLYGON_TICKERS_URL):
     page = 1
 
-    session = requests.Session()
+    session = http_client.get_session()
     # Initial request to get the ticker count
     r = session.get(POLYGON_TICKERS_URL.format(page, API_KEY))
     data = r.json()
@@ -59,11 +56,9 @@ def get_tickers(url = POLYGON_TICKERS_URL):
 # Stich all of these csv files into one dataframe for analysis
 def combine_tickers(directory):
 
-    df = pd.DataFrame()
-
-    for f in os.listdir(directory):
-        df2 = pd.read_csv('{}/{}'.format(directory, f))
-        df = df.append(df2)
+    # One concat instead of appending in a loop, which copied everything read so far per file
+    df = pd.concat([loaders.read_csv('{}/{}'.format(directory, f), 'tickers') for f in os.listdir(directory)],
+                   ignore_index=True)
 
     # Read out a copy of the file to a csv for later analysis
     df.set_index('ticker', inplace=True)
@@ -95,11 +90,8 @@ def filter_us_exch(ticker_df):
 # Get the aggregated bars for the symbols I need
 def get_bars(symbolslist, outdir, start, end):
 
-    session = requests.Session()
-    # In case I run into issues, retry my connection
-    retries = Retry(total=5, backoff_factor=0.1, status_forcelist=[ 500, 502, 503, 504 ])
-
-    session.mount('http://', HTTPAdapter(max_retries=retries))
+    # Shared pooled session, retries on https (including 429) are set up in http_client
+    session = http_client.get_session()
     count = 0
 
     barlog = open("barlog.txt", "w")
@@ -154,11 +146,8 @@ def get_bars(symbolslist, outdir, start, end):
 # Define a function to pull in the splits data
 def get_splits(symbolslist, outdir):
 
-    session = requests.Session()
-    # In case I run into issues, retry my connection
-    retries = Retry(total=5, backoff_factor=0.1, status_forcelist=[ 500, 502, 503, 504 ])
-
-    session.mount('http://', HTTPAdapter(max_retries=retries))
+    # Shared pooled session, retries on https (including 429) are set up in http_client
+    session = http_client.get_session()
     count = 0
 
     # Get the split data
@@ -188,53 +177,48 @@ def get_splits(symbolslist, outdir):
 
 
 # Fix erroneous splits from a correction file manually created
-def fix_splits(splitpath):
+def fix_splits(splitpath, corrections='split_corrections.csv', workers=None):
     # Get the split corrections to overwrite
-    correct_df = pd.read_csv('split_corrections.csv')
+    correct_df = pd.read_csv(corrections)
     # create a list of symbols to fix
     symbols = correct_df['ticker'].tolist()
     # remove duplicates
     symbols = list(dict.fromkeys(symbols))
 
-    # for symbol in symbols:
-    for symbol in symbols:
-        print(symbol)
-
-        # get any splits
-        if os.path.isfile('{}/{}.csv'.format(splitpath, symbol)):
-            df = pd.read_csv('{}/{}.csv'.format(splitpath, symbol))
-            print(df)
-            df = pd.merge(df, correct_df, how='left', left_on=['date', 'ticker'], right_on=['date', 'ticker'])
-
-            for index, row in df.iterrows():
-                # Adjust bad dates
-                if not pd.isnull(row.date_adj):
-                    df.loc[index, 'date'] = row.date_adj
-                # Adjust bad ratios
-                if not pd.isnull(row.ratio_adj):
-                    df.loc[index, 'ratio'] = row.ratio_adj
-                else:
-                    df.loc[index, 'ratio'] = row.ratio_x
+    # Read once per call and handed to the workers, so an edited corrections file is always used
+    report = parallel_map(partial(fix_symbol_splits, splitpath=splitpath, corrections=correct_df),
+                          symbols, workers=workers, name='split files')
+    print(report)
+    return report
 
-            # Format the dataframe for export
-            df = df[['date', 'ticker', 'ratio']]
-            df.set_index('date', inplace=True)
-            print(df)
 
-            # Overwrite the file with this new file
-            df.to_csv('{}/{}.csv'.format(splitpath, symbol))
-            print('Split file for {} corrected'.format(symbol))
+def fix_symbol_splits(symbol, splitpath, corrections='split_corrections.csv'):
+    # get any splits
+    if not os.path.isfile('{}/{}.csv'.format(splitpath, symbol)):
+        raise FileNotFoundError('no split file found for {}'.format(symbol))
+
+    # corrections is the frame read by fix_splits or a corrections file
+    correct_df = pd.read_csv(corrections) if isinstance(corrections, str) else corrections
+    df = pd.read_csv('{}/{}.csv'.format(splitpath, symbol))
+    df = pd.merge(df, correct_df, how='left', left_on=['date', 'ticker'], right_on=['date', 'ticker'])
 
-        else:
-            print('no file found')
+    # Adjust bad dates and bad ratios
+    df['date'] = df['date_adj'].where(df['date_adj'].notna(), df['date'])
+    df['ratio'] = df['ratio_adj'].where(df['ratio_adj'].notna(), df['ratio_x'])
 
-    return ('Split file corrections complete')
+    # Format the dataframe for export
+    df = df[['date', 'ticker', 'ratio']]
+    df.set_index('date', inplace=True)
+
+    # Overwrite the file with this new file
+    df.to_csv('{}/{}.csv'.format(splitpath, symbol))
+    return len(df)
 
 
 # Define a function to pull in the splits data
 def get_divs(symbolslist, outdir):
 
-    session = requests.Session()
+    session = http_client.get_session()
     count = 0
 
     # Get the split data
@@ -259,81 +243,79 @@ def get_divs(symbolslist, outdir):
 
 
 # Combine bars, splits and dividend
-def combine_bars(barpath, splitpath, divpath):
-
-    count = 0
-    for f in os.listdir(barpath):
+def combine_bars(barpath, splitpath, divpath, outdir='data/bars_adj', workers=None):
 
-        symbol = f[:-4]
-        print(symbol)
+    symbols = [f[:-4] for f in os.listdir(barpath) if f.endswith('.csv')]
+    report = parallel_map(partial(combine_symbol_bars, barpath=barpath, splitpath=splitpath,
+                                  divpath=divpath, outdir=outdir),
+                          symbols, workers=workers, name='bar files')
+    print(report)
+    return report
 
-        # Get the bar data
-        if os.path.isfile('{}/{}.csv'.format(barpath, symbol)):
-            bars = pd.read_csv('{}/{}.csv'.format(barpath, symbol), index_col='date')
 
-            # get any splits
-            if os.path.isfile('{}/{}.csv'.format(splitpath, symbol)):
-                splits = pd.read_csv('{}/{}.csv'.format(splitpath, symbol), index_col='date')
-                splits.drop(columns=['ticker'], inplace=True)
+def combine_symbol_bars(symbol, barpath, splitpath, divpath, outdir='data/bars_adj'):
 
-                bars = bars.merge(splits, left_index=True, right_index=True, how='left')
+    # Get the bar data
+    bars = loaders.read_csv('{}/{}.csv'.format(barpath, symbol), 'polygon_bars', price=loaders.EXACT, index_col='date')
 
-            else:
+    # get any splits
+    if os.path.isfile('{}/{}.csv'.format(splitpath, symbol)):
+        splits = loaders.read_csv('{}/{}.csv'.format(splitpath, symbol), 'splits', index_col='date')
+        splits.drop(columns=['ticker'], inplace=True)
 
-                bars = bars
+        bars = bars.merge(splits, left_index=True, right_index=True, how='left')
 
-            # get any dividend payments
-            if os.path.isfile('{}/{}.csv'.format(divpath, symbol)):
-                divs = pd.read_csv('{}/{}.csv'.format(divpath, symbol), index_col='date')
-                divs.drop(columns=['ticker'], inplace=True)
+    # get any dividend payments
+    if os.path.isfile('{}/{}.csv'.format(divpath, symbol)):
+        divs = loaders.read_csv('{}/{}.csv'.format(divpath, symbol), 'divs', index_col='date')
+        divs.drop(columns=['ticker'], inplace=True)
 
-                bars = bars.merge(divs, left_index=True, right_index=True, how='left')
+        bars = bars.merge(divs, left_index=True, right_index=True, how='left')
 
-            else:
-
-                bars = bars
-
-            # Export bars
-            bars.to_csv('data/bars_adj/{}.csv'.format(symbol))
-            count += 1
-
-    return ('{} adjusted bar file were exported'.format(count))
+    # Export bars
+    bars.to_csv('{}/{}.csv'.format(outdir, symbol))
+    return len(bars)
 
 
 # Adjust the OHLCV data for stock splits
-def adj_bars(directory):
+def adj_bars(directory, workers=None):
+
+    files = [f for f in os.listdir(directory) if f.endswith('.csv')]
+    report = parallel_map(partial(adj_bar_file, directory=directory), files,
+                          workers=workers, name='bar files')
+    print(report)
+    return report
 
-    count = 0
-    for f in os.listdir(directory):
 
-        df = pd.read_csv('{}/{}'.format(directory, f), index_col='date')
+def adj_bar_file(f, directory):
 
-        if 'ratio' in df.columns:
-            df['ratio_adj'] = df['ratio']
-        else:
-            df['ratio_adj'] = 1
+    df = loaders.read_csv('{}/{}'.format(directory, f), 'polygon_bars', price=loaders.EXACT, index_col='date')
 
-        # Create a split factor, shifted to the day earlier.  Also, fill in any missing factors with 1
-        df['split_factor'] = (1 / df['ratio_adj'].shift(-1)).fillna(1)
-        #  Create a cumulative product of the splits, in reverse order using the []::-1]
-        df['split_factor'] = df['split_factor'][::-1].cumprod()
+    if 'ratio' in df.columns:
+        df['ratio_adj'] = df['ratio']
+    else:
+        df['ratio_adj'] = 1
 
-        # Adjust the various OHLCV metrics
-        df['volume_adj'] = df['volume'] * df['split_factor']
-        df['open_adj'] = df['open'] / df['split_factor']
-        df['close_adj'] = df['close'] / df['split_factor']
-        df['high_adj'] = df['high'] / df['split_factor']
-        df['low_adj'] = df['low'] / df['split_factor']
-        df['dollar_volume'] = df['volume'] * df['close']
+    # Create a split factor, shifted to the day earlier.  Also, fill in any missing factors with 1
+    df['split_factor'] = (1 / df['ratio_adj'].shift(-1)).fillna(1)
+    #  Create a cumulative product of the splits, in reverse order using the []::-1]
+    df['split_factor'] = df['split_factor'][::-1].cumprod()
 
-        df.to_csv('{}/{}'.format(directory, f))
-        count += 1
+    # Adjust the various OHLCV metrics
+    df['volume_adj'] = df['volume'] * df['split_factor']
+    df['open_adj'] = df['open'] / df['split_factor']
+    df['close_adj'] = df['close'] / df['split_factor']
+    df['high_adj'] = df['high'] / df['split_factor']
+    df['low_adj'] = df['low'] / df['split_factor']
+    df['dollar_volume'] = df['volume'] * df['close']
 
-    return ('{} files was adjusted'.format(count))
+    df.to_csv('{}/{}'.format(directory, f))
+    return len(df)
 
 
 # %%  Get all the tickers on Polygon.io and save them to a data directory
-get_tickers()
+if __name__ == '__main__':
+    get_tickers()
 
 """
 # %% Combine all the paginated ticker files together into one dataframe
@@ -1,14 +1,14 @@
 import time
 import datetime as dt
 import os
-import math
-import requests
+import http_client
 import numpy as np
 import pandas as pd
-import openpyxl
-import json
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mtick
+import bar_store
+import loaders
+import resample
+import trading_calendar
+import reference_data
 
 
 START_DATE = '2019-01-01'
@@ -24,7 +24,7 @@ def get_tickers(key, market="stocks", type="CS", exchange='NYSE'):
     endpoint += f"primary_exchange={exchange}&market={market}&type={type}&apiKey={key}"
     print("Downloading data...")
 
-    call = requests.get(endpoint).json()
+    call = http_client.get(endpoint).json()
     tickers = pd.DataFrame(call["results"])
 
     count = 1
@@ -32,7 +32,7 @@ def get_tickers(key, market="stocks", type="CS", exchange='NYSE'):
     try:
         while call["next_url"]:
             #print(call["next_url"]+f"&apiKey={key}")
-            call = requests.get(call["next_url"]+f"&apiKey={key}").json()
+            call = http_client.get(call["next_url"]+f"&apiKey={key}").json()
             temp = pd.DataFrame(call["results"])
             tickers = pd.concat([tickers, temp], ignore_index=True)
             count += 1
@@ -54,32 +54,31 @@ def get_ticker_types(key):
     with its tickers and other details
     """
     endpoint = f"https://api.polygon.io/v3/reference/tickers/types?apiKey={key}"
-    call = requests.get(endpoint).json()
+    call = http_client.get(endpoint).json()
     ticker_types = pd.DataFrame(call["results"])
     ticker_types.to_csv(f"Data/Ticker_Types/ticker_types.csv")
     return ticker_types
 
-def get_ticker_details(*tickers, key, path="Data/Ticker_Details"):
-
-    isExist = os.path.exists(path)
-
-    if not isExist:
-        # Create a new directory because it does not exist
-        os.makedirs(path)
-        print("Path didn't exist. A new directory is created!")
-
+def get_ticker_details(*tickers, key, path=reference_data.PATH, batch=100):
+    """
+    Downloads ticker details and upserts them, one flattened row per ticker,
+    into the reference data store every batch tickers
+    """
     downloaded = 0
     skipped = 0
     tickers_skipped = []
+    rows = []
 
     for ticker in tickers:
         try:
             print(f"Downloading {ticker}")
             endpoint = f"https://api.polygon.io/v3/reference/tickers/{ticker}?apiKey={key}"
-            call = requests.get(endpoint).json()
-            ticker_details = pd.DataFrame(call["results"])
-            ticker_details.to_csv(f"{path}/{ticker}_details.csv")
+            call = http_client.get(endpoint).json()
+            rows.append(reference_data.flatten_details(call["results"]))
             downloaded += 1
+            if len(rows) >= batch:
+                reference_data.upsert(rows, path)
+                rows = []
 
         except Exception as e:
             print(f"{ticker} has a problem: {e}, skipping...")
@@ -88,6 +87,9 @@ def get_ticker_details(*tickers, key, path="Data/Ticker_Details"):
 
         time.sleep(12)
 
+    if rows:
+        reference_data.upsert(rows, path)
+
     print("Download completed")
     print(f"Data downloaded for {downloaded} securities")
     print(f"{skipped} tickers skipped")
@@ -113,14 +115,14 @@ def get_ticker_news(*tickers, key, start_date=START_DATE, path="Data/Ticker_News
         try:
             print(f"Downloading {ticker}")
             endpoint = f"https://api.polygon.io/v2/reference/news?ticker={ticker}&published_utc.gte={start_date}&order=asc&limit=1000&sort=published_utc&apiKey={key}"
-            call = requests.get(endpoint).json()
+            call = http_client.get(endpoint).json()
             ticker_news = pd.DataFrame(call["results"])
             downloaded += 1
             count = 1
             try:
                 while call["next_url"]:
                     #print(call["next_url"]+f"&apiKey={key}")
-                    call = requests.get(call["next_url"] + f"&apiKey={key}").json()
+                    call = http_client.get(call["next_url"] + f"&apiKey={key}").json()
                     temp = pd.DataFrame(call["results"])
                     ticker_news = pd.concat([ticker_news, temp], ignore_index=True)
                     count += 1
@@ -200,7 +202,7 @@ def get_price_data(*tickers, key, path='Data/Price_Data/Energy_S&P500', start=ST
         try:
             print(f"Downloading {ticker}")
             endpoint = f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/1/day/{start}/{end}?adjusted={adjusted}&sort=asc&limit=50000&apiKey={key}"
-            call = requests.get(endpoint).json()
+            call = http_client.get(endpoint).json()
             price = pd.DataFrame(call["results"])
             price['t'] = pd.to_datetime(price['t'], unit='ms').dt.date
             price.to_csv(f"{path}/{ticker}.csv")
@@ -222,22 +224,53 @@ def get_price_data(*tickers, key, path='Data/Price_Data/Energy_S&P500', start=ST
             print(ticker)
 
 
-def get_closing_prices(path='Data/Price_Data/Energy_S&P500'):
+def refresh_price_data(*tickers, key, path='Data/Price_Data/Energy_S&P500', end=None, adjusted=True):
     """
-    Returns file with closing prices for selected securities
+    Appends the bars after each stored ticker's last date (default: every ticker in path)
     """
-    files = [file for file in os.listdir(path) if not file.startswith('0')]
+    tickers = tickers or bar_store.list_tickers(path)
+    end = end or TODAY.isoformat()
+    appended = 0
+    skipped = 0
+    tickers_skipped = []
+
+    for ticker in tickers:
+        try:
+            start = (bar_store.read_tail(ticker, 1, path)['t'].iloc[-1] + dt.timedelta(days=1)).date()
+            if start.isoformat() > end:
+                continue
+            print(f"Refreshing {ticker} from {start}")
+            endpoint = f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/1/day/{start}/{end}?adjusted={adjusted}&sort=asc&limit=50000&apiKey={key}"
+            call = http_client.get(endpoint).json()
+            if call.get("results"):
+                price = pd.DataFrame(call["results"])
+                price['t'] = pd.to_datetime(price['t'], unit='ms').dt.date
+                appended += bar_store.append_bars(ticker, price, path)
+
+        except Exception as e:
+            print(f"{ticker} has a problem: {e}, skipping...")
+            skipped += 1
+            tickers_skipped.append(ticker)
 
-    closes = pd.DataFrame()
+        time.sleep(12)
 
-    for file in files:
-        df = pd.DataFrame(pd.read_csv(f"{path}/{file}", index_col='t')['c'])
-        df.rename(columns={'c': file[:-4]}, inplace=True)
+    print("Refresh completed")
+    print(f"{appended} bars appended")
+    print(f"{skipped} tickers skipped")
+    if tickers_skipped:
+        print(" Tickers skipped ".center(30, "="))
+        for ticker in tickers_skipped:
+            print(ticker)
 
-        if closes.empty:
-            closes = df
-        else:
-            closes = pd.concat([closes, df], axis=1)
+
+def get_closing_prices(path='Data/Price_Data/Energy_S&P500', workers=None):
+    """
+    Returns file with closing prices for selected securities
+    """
+    # Align on the shared trading calendar so missing days show up as gaps instead of shifted rows
+    closes = trading_calendar.aligned_prices(path, 'c', workers=workers)
+    closes.index = closes.index.date
+    closes.index.name = 't'
 
     closes.to_csv(f"{path}/0-closes.csv")
     print(closes)
@@ -248,7 +281,7 @@ def returns_from_closes(path='Data/Price_Data/Energy_S&P500', filename='0-closes
     Returns instantaneous returns for selected securities
     """
     try:
-        data = pd.read_csv(f"{path}/{filename}", index_col='t')
+        data = loaders.read_csv(f"{path}/{filename}", 'closes', price=loaders.EXACT)
 
     except Exception as e:
         print(f"There was a problem: {e}")
@@ -261,14 +294,19 @@ def get_corr(data):
     """
     return data.corr()
 
-def plot_closes(closes, relative=False):
+def plot_closes(closes, relative=False, interactive=False):
     """
-    Plot absolute or relative closes for securities
+    Plot absolute or relative closes for securities,
+    interactive=True opens a downsampled plotly chart instead
     """
     if closes.endswith('.csv'):
-        closes = pd.read_csv(closes, index_col='t')
+        closes = loaders.read_csv(closes, 'closes')
     else:
         closes = pd.read_excel(closes, index_col='t')
+    if interactive:
+        import interactive_charts
+        return interactive_charts.performance_figure(closes, relative=relative).show()
+    import matplotlib.pyplot as plt
     if relative:
         relative_change = closes / closes.iloc[0] - 1
         relative_change.plot()
@@ -301,7 +339,7 @@ def get_return_data(*tickers, key, path='Data/Price_Data/Energy_S&P500', start=S
         try:
             print(f"Downloading {ticker}")
             endpoint = f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/1/day/{start}/{end}?adjusted={adjusted}&sort=asc&limit=50000&apiKey={key}"
-            temp[['t', ticker]] = pd.DataFrame(requests.get(endpoint).json()["results"])[['t', 'c']]
+            temp[['t', ticker]] = pd.DataFrame(http_client.get(endpoint).json()["results"])[['t', 'c']]
             temp['t'] = pd.to_datetime(temp['t'], unit='ms').dt.date
             temp.set_index('t', inplace=True)
             downloaded += 1
@@ -331,36 +369,32 @@ def get_return_data(*tickers, key, path='Data/Price_Data/Energy_S&P500', start=S
             print(ticker)
     return data, data_instantaneous, data_pct
 
-def plot_performance(path='Data/Price_Data/Energy_S&P500'):
+def plot_performance(path='Data/Price_Data/Energy_S&P500', period=None, columns=4):
     """
-    Returns figure containing relative performance of all securities in path
+    Returns figure containing relative performance of all securities in path,
+    optionally on weekly/monthly/custom bars.
+    Use plot_pipeline.render_path to write paged grids to files without a display
     """
-    files = [file for file in os.listdir(path) if not file.startswith('0')]
-    fig, ax = plt.subplots(math.ceil(len(files) / 4), 4, figsize=(16, 16))
-    count = 0
-    print(files[0][:-4])
-    for row in range(math.ceil(len(files) / 4)):
-        print(row)
-        for column in range(4):
-            print(column)
-            try:
-                data = pd.read_csv(f"{path}/{files[count]}", index_col='t')['c']
-                data = (data / data[0] - 1) * 100
-                print(data.head())
-                ax[row, column].plot(data, label=files[count][:-4])
-                ax[row, column].legend()
-                ax[row, column].yaxis.set_major_formatter(mtick.PercentFormatter())
-                ax[row, column].axhline(0, c='r', ls='--')
-            except:
-                pass
-            count += 1
-            print(count)
+    import matplotlib.pyplot as plt
+    import plot_pipeline
+    if period:
+        closes = resample.resampled_closes(path, period)
+    else:
+        closes = trading_calendar.aligned_prices(path, 'c')
+    performance = plot_pipeline.relative_performance(closes)
+    rows, columns = plot_pipeline.grid_shape(len(performance.columns), columns)
+    fig, ax = plt.subplots(rows, columns, figsize=(4 * columns, 3 * rows), squeeze=False)
+    plot_pipeline.draw_performance(ax, performance)
+    fig.tight_layout()
     plt.show()
+    return fig
 
 def get_earnings(key):
     """
     Returns list of tickers for companies reporting in the next week
     """
+    # EOD Historical Data client (pip install eod), only needed here
+    from eod import EodHistoricalData
     client = EodHistoricalData(key)
     eps = pd.DataFrame(client.get_calendar_earnings())
     symbols = []
@@ -390,14 +424,14 @@ def get_dividends(*tickers, key, path = 'Data/Dividends_Data/Energy_S&P500', sta
         try:
             print(f"Downloading {ticker}")
             endpoint = f"https://api.polygon.io/v3/reference/dividends?ticker={ticker}&ex_dividend_date.gte={start}&order=asc&limit=1000&apiKey={key}"
-            call = requests.get(endpoint).json()
+            call = http_client.get(endpoint).json()
             dividends = pd.DataFrame(call["results"])
             downloaded += 1
             count = 1
             try:
                 while call["next_url"]:
                     # print(call["next_url"]+f"&apiKey={key}")
-                    call = requests.get(call["next_url"] + f"&apiKey={key}").json()
+                    call = http_client.get(call["next_url"] + f"&apiKey={key}").json()
                     temp = pd.DataFrame(call["results"])
                     dividends = pd.concat([dividends, temp], ignore_index=True)
                     count += 1
@@ -425,26 +459,9 @@ def get_dividends(*tickers, key, path = 'Data/Dividends_Data/Energy_S&P500', sta
             print(ticker)
 
 def main():
-    key = 'NexrgAqzDgn0PINe8qadOI_6ERpEG8wc'
-    #key = open('api_token.txt').read()
-    #print(get_tickers(key))
-    #print(get_ticker_types(key))
-    energy = get_sp(symbols=True, sector='Energy')
-    #print(energy)
-    #print(get_sic_code(path="Data/SIC Code List"))
-    #print(get_ticker_details(*energy, key=key, path="Data/Ticker_Details"))
-    #get_ticker_news(*energy, key=key, start_date=START_DATE, path="Data/Ticker_News")
-    #get_price_data(*energy, key=key)
-    #get_price_data('AAPL', key=key)
-    #get_closing_prices(path='Data/Price_Data/Test')
-    #print(returns_from_closes(path='Data/Price_Data/Test', filename='0-closes.csv'))
-    #print(get_corr(returns_from_closes(path='Data/Price_Data/Test', filename='0-closes.csv')))
-    #plot_closes(closes='Data/Price_Data/Test/0-closes.csv', relative=True)
-    #returns = get_return_data(*energy, path='Data/Price_Data/Test', key=key)
-    #print(returns[0])
-    #plot_performance(path='Data/Price_Data/Test')
-    #print(get_earnings(key))
-    print(get_dividends(*energy, key=key))
+    # Downloading, refreshing, building closes, adjusting, optimizing and plotting are subcommands of main.py
+    import main as cli
+    cli.main()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
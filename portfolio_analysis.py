@@ -0,0 +1,462 @@
+"""
+Implementation of Modern Portfolio Theory
+"""
+
+import numpy as np
+import datetime as dt
+import pandas as pd
+import scipy.linalg as la
+import scipy.optimize as sc
+import scipy.sparse as sp
+from functools import partial
+import price_sources
+import reference_data
+from parallel import SharedArray, parallel_map
+
+#Import Data
+def get_data(stocks, start, end, source=None):
+    """
+    Returns mean daily returns and the covariance matrix of the adjusted closes of stocks
+    between start and end, from the local bar store unless another PriceSource is given
+    """
+    source = source or price_sources.BarStoreSource()
+    return source.moments(stocks, start, end)
+
+def portfolio_performance(weights, mean_returns, cov_matrix):
+    returns = np.sum(mean_returns * weights) * 252
+    std = np.sqrt(weights.T @ cov_matrix @ weights) * np.sqrt(252)
+    return returns, std
+
+def negative_sharpe_ratio(weights, mean_returns, cov_matrix, risk_free_rate=0):
+    returns, std = portfolio_performance(weights, mean_returns, cov_matrix)
+    return - (returns - risk_free_rate) / std
+
+# Number of solver variables up to which SLSQP is used instead of the interior point solver
+DENSE_LIMIT = 200
+
+class PortfolioConstraints:
+    """
+    Linear portfolio constraints kept as sparse matrices for the solver: per-asset bounds,
+    group (sector) caps, a turnover limit against current holdings and a cardinality limit
+    """
+    def __init__(self, assets, constraint_set=(0, 1)):
+        self.assets = list(assets)
+        num_assets = len(self.assets)
+        self.lower = np.full(num_assets, float(constraint_set[0]))
+        self.upper = np.full(num_assets, float(constraint_set[1]))
+        self.groups = []
+        self.current = None
+        self.turnover = None
+        self.max_assets = None
+
+    def set_bounds(self, bounds):
+        "Per-asset (lower, upper) weight bounds, e.g. {'XOM': (-0.1, 0.2)} for long/short"
+        for asset, (lower, upper) in bounds.items():
+            i = self.assets.index(asset)
+            self.lower[i], self.upper[i] = lower, upper
+        return self
+
+    def add_group_caps(self, groups, caps, floors=None):
+        """
+        groups maps asset -> group, caps maps group -> maximum total weight (or one cap for all groups),
+        floors optionally maps group -> minimum total weight
+        """
+        labels = pd.Series([groups.get(asset) for asset in self.assets])
+        for group in labels.dropna().unique():
+            cap = caps.get(group, np.inf) if isinstance(caps, dict) else caps
+            floor = (floors or {}).get(group, -np.inf)
+            members = np.flatnonzero(labels == group)
+            row = sp.csr_matrix((np.ones(len(members)), (np.zeros(len(members), dtype=int), members)),
+                                shape=(1, len(self.assets)))
+            self.groups.append((row, floor, cap))
+        return self
+
+    def add_sector_caps(self, caps, level='sector'):
+        "Group caps by the sector (SEC office) or industry of each asset's SIC code in the reference data"
+        return self.add_group_caps(reference_data.lookup(level), caps)
+
+    def limit_turnover(self, current, limit):
+        "Sum of |new weight - current weight| may not exceed limit"
+        current = pd.Series(current) if isinstance(current, dict) else current
+        if isinstance(current, pd.Series):
+            current = current.reindex(self.assets).fillna(0).to_numpy()
+        self.current = np.asarray(current, dtype=float)
+        self.turnover = limit
+        return self
+
+    def limit_assets(self, max_assets):
+        "At most max_assets non-zero weights"
+        self.max_assets = max_assets
+        return self
+
+    def system(self, lower=None, upper=None):
+        """
+        Returns (A, lb, ub, lo, hi) with lb <= A z <= ub and lo <= z <= hi over z = [weights, turnover slacks]
+        """
+        n = len(self.assets)
+        lower = self.lower if lower is None else lower
+        upper = self.upper if upper is None else upper
+        slacks = n if self.turnover is not None else 0
+
+        blocks = [sp.csr_matrix(np.ones((1, n)))]
+        lb, ub = [1.0], [1.0]
+        for row, floor, cap in self.groups:
+            blocks.append(row)
+            lb.append(floor)
+            ub.append(cap)
+        A = sp.vstack(blocks, format='csr')
+        if slacks:
+            A = sp.hstack([A, sp.csr_matrix((A.shape[0], slacks))], format='csr')
+            identity = sp.identity(n, format='csr')
+            # t >= w - current and t >= current - w, with the slacks summing to at most the limit
+            A = sp.vstack([A, sp.hstack([identity, -identity]), sp.hstack([-identity, -identity]),
+                           sp.hstack([sp.csr_matrix((1, n)), sp.csr_matrix(np.ones((1, n)))])], format='csr')
+            lb += [-np.inf] * (2 * n + 1)
+            ub += list(self.current) + list(-self.current) + [self.turnover]
+
+        # Upper bounds the budget already implies (w_i <= 1 - sum of the other lower bounds) only slow the solvers
+        implied = upper >= 1 - (lower.sum() - lower) - 1e-12
+        lo = np.concatenate([lower, np.zeros(slacks)])
+        hi = np.concatenate([np.where(implied, np.inf, upper), np.full(slacks, np.inf)])
+        return A, np.asarray(lb, dtype=float), np.asarray(ub, dtype=float), lo, hi
+
+def _quadratic(cov_matrix, size):
+    "Objective, gradient and constant hessian of w' cov w * 252 over the first len(cov) entries of z"
+    cov = np.asarray(cov_matrix, dtype=float) * 252
+    n = len(cov)
+    hessian = np.zeros((size, size))
+    hessian[:n, :n] = 2 * cov
+    fun = lambda z: z[:n] @ cov @ z[:n]
+    jac = lambda z: hessian @ z
+    return fun, jac, lambda z: hessian
+
+def _dense_constraints(constraint):
+    "SLSQP equality and inequality dicts for lb <= A z <= ub"
+    A = constraint.A.toarray() if sp.issparse(constraint.A) else np.atleast_2d(constraint.A)
+    lb = np.broadcast_to(np.asarray(constraint.lb, dtype=float), A.shape[:1])
+    ub = np.broadcast_to(np.asarray(constraint.ub, dtype=float), A.shape[:1])
+    equal = lb == ub
+    rows = [('eq', A[equal], ub[equal]),
+            ('ineq', -A[np.isfinite(ub) & ~equal], -ub[np.isfinite(ub) & ~equal]),
+            ('ineq', A[np.isfinite(lb) & ~equal], lb[np.isfinite(lb) & ~equal])]
+    return [{'type': kind, 'fun': lambda z, A=A, b=b: A @ z - b, 'jac': lambda z, A=A: A}
+            for kind, A, b in rows if len(A)]
+
+def _interior_point(fun, jac, hess, x0, bounds, constraints, tol=1e-8, max_iter=100):
+    """
+    Mehrotra predictor-corrector interior point for a convex quadratic over linear constraints.
+    Bounds are constraint rows like any other: each iteration is one dense Cholesky factorization
+    of the hessian plus the barrier terms, however many rows or active bounds there are
+    """
+    n = len(x0)
+    P, q = np.asarray(hess(x0), dtype=float), jac(np.zeros(n))
+    A = sp.vstack([sp.csr_matrix(c.A) for c in constraints] + [sp.identity(n, format='csr')], format='csr')
+    lb = np.concatenate([np.broadcast_to(np.asarray(c.lb, dtype=float), c.A.shape[:1]) for c in constraints]
+                        + [np.broadcast_to(np.asarray(bounds.lb, dtype=float), (n,))])
+    ub = np.concatenate([np.broadcast_to(np.asarray(c.ub, dtype=float), c.A.shape[:1]) for c in constraints]
+                        + [np.broadcast_to(np.asarray(bounds.ub, dtype=float), (n,))])
+    # Equalities E x = f and inequalities G x <= h
+    equal = lb == ub
+    above, below = np.isfinite(ub) & ~equal, np.isfinite(lb) & ~equal
+    E, f = A[equal], ub[equal]
+    G, h = sp.vstack([A[above], -A[below]], format='csr'), np.concatenate([ub[above], -lb[below]])
+    E_dense = E.toarray()
+
+    x, nu = np.asarray(x0, dtype=float).copy(), np.zeros(len(f))
+    s, z = np.maximum(h - G @ x, 1.), np.ones(len(h))
+    status, message = 0, "Iteration limit reached, the constraints may be infeasible"
+    for it in range(1, max_iter + 1):
+        r_dual = P @ x + q + E.T @ nu + G.T @ z
+        r_eq, r_ineq = E @ x - f, G @ x + s - h
+        mu = s @ z / max(len(s), 1)
+        # Residuals relative to the size of the terms they balance
+        dual_scale = 1 + max(np.abs(P @ x).max(), np.abs(q).max(), np.abs(G.T @ z).max(initial=0),
+                             np.abs(E.T @ nu).max(initial=0))
+        primal_scale = 1 + max(np.abs(h).max(initial=0), np.abs(f).max(initial=0), np.abs(x).max())
+        if (np.abs(r_dual).max() <= tol * dual_scale and mu <= tol * dual_scale
+                and max(np.abs(r_eq).max(initial=0), np.abs(r_ineq).max(initial=0)) <= tol * primal_scale):
+            status, message = 1, "Optimization terminated successfully"
+            break
+
+        w = z / s
+        H = P + (G.T @ sp.diags(w) @ G).toarray()
+        # Scaled to the hessian, not to the barrier terms that grow as mu goes to 0
+        H[np.diag_indices(n)] += 1e-12 * max(1, np.abs(np.diag(P)).max())
+        try:
+            factor = la.cho_factor(H)
+            HE = la.cho_solve(factor, E_dense.T)
+            schur = la.cho_factor(E_dense @ HE) if len(f) else None
+        except la.LinAlgError:
+            status, message = 2, "Singular system, the constraints may be degenerate"
+            break
+
+        def direction(r_comp):
+            # Newton step with ds and dz eliminated, then nu through the Schur complement of H
+            Hr = la.cho_solve(factor, -r_dual - G.T @ (r_comp / s + w * r_ineq))
+            dnu = la.cho_solve(schur, E @ Hr + r_eq) if len(f) else np.zeros(0)
+            dx = Hr - HE @ dnu
+            ds = -r_ineq - G @ dx
+            return dx, dnu, ds, (r_comp - z * ds) / s
+
+        def step(v, dv):
+            shrink = dv < 0
+            return min(1., (-v[shrink] / dv[shrink]).min(initial=np.inf))
+
+        dx, dnu, ds, dz = direction(-s * z)
+        alpha = min(step(s, ds), step(z, dz))
+        sigma = ((s + alpha * ds) @ (z + alpha * dz) / max(len(s), 1) / mu) ** 3
+        dx, dnu, ds, dz = direction(-s * z + sigma * mu - ds * dz)
+        alpha = min(1., 0.99 * min(step(s, ds), step(z, dz)))
+        x, nu, s, z = x + alpha * dx, nu + alpha * dnu, s + alpha * ds, z + alpha * dz
+    return sc.OptimizeResult(x=x, fun=fun(x), success=status == 1, status=status, message=message, nit=it)
+
+def _minimize(fun, jac, hess, x0, bounds, constraints):
+    """
+    Minimizes a quadratic over linear constraints: SLSQP on dense matrices for small problems,
+    the interior point above DENSE_LIMIT, where SLSQP's active set iterations get slow
+    """
+    if len(x0) <= DENSE_LIMIT:
+        dense = [row for constraint in constraints for row in _dense_constraints(constraint)]
+        return sc.minimize(fun, x0, jac=jac, method='SLSQP', bounds=bounds, constraints=dense,
+                           options={'ftol': 1e-12, 'maxiter': 1000})
+    return _interior_point(fun, jac, hess, x0, bounds, constraints)
+
+def _solve_min_variance(cov_matrix, constraints, extra_rows=None, lower=None, upper=None):
+    A, lb, ub, lo, hi = constraints.system(lower, upper)
+    if extra_rows is not None:
+        row, value = extra_rows
+        A = sp.vstack([A, sp.hstack([row, sp.csr_matrix((1, A.shape[1] - row.shape[1]))])], format='csr')
+        lb, ub = np.append(lb, value), np.append(ub, value)
+    fun, jac, hess = _quadratic(cov_matrix, A.shape[1])
+    x0 = np.concatenate([np.full(len(constraints.assets), 1. / len(constraints.assets)), np.zeros(A.shape[1] - len(constraints.assets))])
+    return _minimize(fun, jac, hess, x0, sc.Bounds(lo, hi), [sc.LinearConstraint(A, lb, ub)])
+
+def _solve_max_sharpe(mean_returns, cov_matrix, risk_free_rate, constraints, lower=None, upper=None):
+    """
+    Max Sharpe as a convex problem: with w = y / k, minimize y' cov y subject to
+    (mean - rf)' y = 1 and every constraint a'w <= b rewritten as a'y - b k <= 0
+    """
+    A, lb, ub, lo, hi = constraints.system(lower, upper)
+    size = A.shape[1]
+    # Bounds other than 0 and infinity scale with k, so they become constraint rows
+    scaled = np.flatnonzero(np.isfinite(lo) & (lo != 0))
+    capped = np.flatnonzero(np.isfinite(hi) & (hi != 0))
+    identity = sp.identity(size, format='csr')
+    # Equalities stay equalities, a pair of opposite inequalities would leave the barrier no interior
+    equal = lb == ub
+    upper_rows, lower_rows = np.isfinite(ub) & ~equal, np.isfinite(lb) & ~equal
+    rows = [A[upper_rows], identity[capped], -A[lower_rows], -identity[scaled]]
+    rhs = [ub[upper_rows], hi[capped], -lb[lower_rows], -lo[scaled]]
+    A_ub = sp.hstack([sp.vstack(rows, format='csr'), -np.concatenate(rhs)[:, None]], format='csr')
+    A_eq = sp.hstack([A[equal], -ub[equal][:, None]], format='csr')
+    excess = np.zeros(size + 1)
+    excess[:len(mean_returns)] = np.asarray(mean_returns, dtype=float) * 252 - risk_free_rate
+    if excess.max() <= 0:
+        raise ValueError("No asset has a mean return above the risk free rate")
+
+    bounds = sc.Bounds(np.append(np.where(lo == 0, 0, -np.inf), 0), np.append(np.where(hi == 0, 0, np.inf), np.inf))
+    fun, jac, hess = _quadratic(cov_matrix, size + 1)
+    x0 = np.append(np.full(size, 1. / size), 1.) / max(excess.max(), 1e-9)
+    result = _minimize(fun, jac, hess, x0, bounds,
+                       [sc.LinearConstraint(A_ub, -np.inf, 0),
+                        sc.LinearConstraint(sp.vstack([A_eq, sp.csr_matrix(excess[None, :])], format='csr'),
+                                            np.append(np.zeros(A_eq.shape[0]), 1),
+                                            np.append(np.zeros(A_eq.shape[0]), 1))])
+    result.x = result.x[:size] / result.x[size]
+    return result
+
+
+def _check(result, constraints, lower=None, upper=None, tol=1e-6):
+    "Raises ValueError when the solver failed or its weights break the constraints"
+    A, lb, ub, lo, hi = constraints.system(lower, upper)
+    z = result.x[:A.shape[1]]
+    residual = A @ z
+    violation = max(0, np.max(lb - residual), np.max(residual - ub), np.max(lo - z), np.max(z - hi))
+    if not result.success or violation > tol:
+        raise ValueError(f"Portfolio optimization failed: {result.message} "
+                         f"(largest constraint violation {violation:.2g}), the constraints may be infeasible")
+    return result
+
+def _optimize(solve, constraints):
+    """
+    Runs solve, then re-solves on the largest weights when a cardinality limit is exceeded.
+    Raises ValueError when either solve fails or leaves a constraint broken
+    """
+    result = _check(solve(None, None), constraints)
+    n = len(constraints.assets)
+    weights = result.x[:n]
+    if constraints.max_assets is not None and (np.abs(weights) > 1e-6).sum() > constraints.max_assets:
+        keep = np.argsort(-np.abs(weights))[:constraints.max_assets]
+        dropped = np.ones(n, dtype=bool)
+        dropped[keep] = False
+        lower, upper = constraints.lower.copy(), constraints.upper.copy()
+        lower[dropped] = 0
+        upper[dropped] = 0
+        result = _check(solve(lower, upper), constraints, lower, upper)
+    result.x = result.x[:n]
+    return result
+
+def max_sharpe_ratio(mean_returns, cov_matrix, risk_free_rate=0, constraint_set=(0, 1), constraints=None):
+    "Maximize the sharpe ratio by altering the weights of the portfolio"
+    constraints = constraints or PortfolioConstraints(mean_returns.index, constraint_set)
+    result = _optimize(lambda lower, upper: _solve_max_sharpe(mean_returns, cov_matrix, risk_free_rate,
+                                                              constraints, lower, upper), constraints)
+    result.fun = negative_sharpe_ratio(result.x, mean_returns, cov_matrix, risk_free_rate)
+    return result
+
+def portfolio_variance(weights, mean_returns, cov_matrix):
+    return portfolio_performance(weights, mean_returns, cov_matrix)[1]
+
+def minimize_variance(mean_returns, cov_matrix, constraint_set=(0, 1), constraints=None):
+    "Minimize the portfolio variance by altering the weights/allocation of assets in the portfolio"
+    constraints = constraints or PortfolioConstraints(mean_returns.index, constraint_set)
+    result = _optimize(lambda lower, upper: _solve_min_variance(cov_matrix, constraints, None, lower, upper),
+                       constraints)
+    result.fun = portfolio_variance(result.x, mean_returns, cov_matrix)
+    return result
+
+def portfolio_return(weights, mean_returns, cov_matrix):
+    return portfolio_performance(weights, mean_returns, cov_matrix)[0]
+
+def efficient_optimization(mean_returns, cov_matrix, return_target, constraint_set=(0, 1), constraints=None):
+    """
+    For each return_target, we want to optimize the portfolio for min variance
+    """
+    constraints = constraints or PortfolioConstraints(mean_returns.index, constraint_set)
+    target_row = (sp.csr_matrix(np.asarray(mean_returns, dtype=float)[None, :] * 252), return_target)
+    effOpt = _optimize(lambda lower, upper: _solve_min_variance(cov_matrix, constraints, target_row, lower, upper),
+                       constraints)
+    effOpt.fun = portfolio_variance(effOpt.x, mean_returns, cov_matrix)
+    return effOpt
+
+def calculated_results(mean_returns, cov_matrix, risk_free_rate=0, constraint_set=(0, 1), constraints=None):
+    """
+    Read in mean, cov matrix and other financial information
+    Output: Max Sharpe Ratio, Min Volatility, Efficient Frontier
+    """
+    # Max Sharpe Ratio Portfolio
+    max_SR_portfolio = max_sharpe_ratio(mean_returns, cov_matrix, risk_free_rate, constraint_set, constraints)
+    max_SR_returns, max_SR_std = portfolio_performance(max_SR_portfolio['x'],
+                                                       mean_returns, cov_matrix)
+    max_SR_allocation = pd.DataFrame(max_SR_portfolio['x'], index=mean_returns.index,
+                                     columns=['allocation'])
+    max_SR_allocation.allocation = [round(i * 100, 0) for i in max_SR_allocation.allocation]
+
+    # Min Volatility Portfolio
+    min_Vol_portfolio = minimize_variance(mean_returns, cov_matrix, constraint_set, constraints)
+    min_Vol_returns, min_Vol_std = portfolio_performance(min_Vol_portfolio['x'],
+                                                       mean_returns, cov_matrix)
+    min_Vol_allocation = pd.DataFrame(min_Vol_portfolio['x'], index=mean_returns.index,
+                                     columns=['allocation'])
+    min_Vol_allocation.allocation = [round(i * 100, 0) for i in min_Vol_allocation.allocation]
+
+    # Efficient Frontier
+    efficient_list = []
+    target_returns = np.linspace(min_Vol_returns, max_SR_returns, 20)
+    for target in target_returns:
+        efficient_list.append(efficient_optimization(mean_returns, cov_matrix, target, constraint_set, constraints)['fun'])
+
+    max_SR_returns, max_SR_std = round(max_SR_returns * 100, 2), round(max_SR_std * 100, 2)
+    min_Vol_returns, min_Vol_std = round(min_Vol_returns * 100, 2), round(min_Vol_std * 100, 2)
+
+
+    return max_SR_returns, max_SR_std, max_SR_allocation, min_Vol_returns, min_Vol_std, min_Vol_allocation, efficient_list, target_returns
+
+def EF_graph(mean_returns, cov_matrix, risk_free_rate=0, constraint_set=(0,1), constraints=None):
+    """
+    Returns a graph ploting the min volatility, max sharpe ratio and efficient frontier
+    """
+    max_SR_returns, max_SR_std, max_SR_allocation, min_Vol_returns, min_Vol_std, min_Vol_allocation, efficient_list, target_returns = calculated_results(mean_returns, cov_matrix, risk_free_rate, constraint_set, constraints)
+
+    # plotly loads here, optimize without --plot, the frontier artifact and batch workers never need it
+    import interactive_charts
+    fig = interactive_charts.frontier_figure((max_SR_std, max_SR_returns), (min_Vol_std, min_Vol_returns),
+                                             efficient_list, target_returns)
+    return fig.show()
+
+
+def scenario_window(scenario, tickers):
+    "The (tickers, start, end) window a scenario estimates its mean returns and covariance over"
+    constraints = scenario.get('constraints')
+    assets = constraints.assets if constraints is not None else scenario.get('tickers', tickers)
+    return tuple(assets), scenario.get('start'), scenario.get('end')
+
+def _solve_window(window, handle, dates, columns, windows):
+    """
+    Solves every scenario over one window. The moments are estimated once for the window and the
+    min volatility portfolio, which does not depend on the risk free rate, once per constraint set
+    """
+    tickers, start, end = window
+    dates = pd.DatetimeIndex(dates)
+    first = dates.searchsorted(pd.Timestamp(start)) if start is not None else 0
+    last = dates.searchsorted(pd.Timestamp(end), side='right') if end is not None else len(dates)
+    # Only this window's rows and columns are copied out of shared memory
+    values = SharedArray.attach(handle)[first:last, [columns.index(ticker) for ticker in tickers]]
+    returns = pd.DataFrame(values, index=dates[first:last], columns=list(tickers))
+    mean_returns, cov_matrix = returns.mean(), returns.cov()
+
+    rows = []
+    min_vol = {}
+    for name, scenario in windows[window]:
+        constraint_set = tuple(scenario.get('constraint_set', (0, 1)))
+        constraints = scenario.get('constraints') or PortfolioConstraints(tickers, constraint_set)
+        risk_free_rate = scenario.get('risk_free_rate', 0)
+        key = id(scenario['constraints']) if scenario.get('constraints') is not None else constraint_set
+        try:
+            if key not in min_vol:
+                min_vol[key] = minimize_variance(mean_returns, cov_matrix, constraints=constraints).x
+            portfolios = {'max_sharpe': max_sharpe_ratio(mean_returns, cov_matrix, risk_free_rate, constraints=constraints).x,
+                          'min_volatility': min_vol[key]}
+        except ValueError as error:
+            # An infeasible scenario is left out of the table, the others of the window are still solved
+            print(f"Scenario {name}: {error}")
+            continue
+        for portfolio, weights in portfolios.items():
+            annual_return, std = portfolio_performance(weights, mean_returns, cov_matrix)
+            for ticker, weight in zip(tickers, weights):
+                rows.append({'scenario': name, 'portfolio': portfolio, 'ticker': ticker, 'allocation': weight,
+                             'returns': annual_return, 'volatility': std,
+                             'sharpe': (annual_return - risk_free_rate) / std})
+    return rows
+
+def batch_optimize(scenarios, returns=None, workers=None):
+    """
+    Solves many what-if portfolios in one call. Each scenario is a dict with any of
+    name, tickers, start, end, risk_free_rate, constraint_set and constraints (a PortfolioConstraints).
+    returns holds the daily returns of every ticker (default: the adjusted closes of the local bar store).
+    Scenarios over the same window share their moments and are solved together in one worker,
+    scenarios whose constraints cannot be met are reported and left out.
+    Returns a tidy table with one row per scenario, portfolio (max_sharpe, min_volatility) and ticker
+    """
+    if returns is None:
+        returns = price_sources.BarStoreSource().returns()
+    scenarios = list(scenarios)
+    windows = {}
+    for i, scenario in enumerate(scenarios):
+        window = scenario_window(scenario, list(returns.columns))
+        windows.setdefault(window, []).append((scenario.get('name', i), scenario))
+
+    with SharedArray(returns.to_numpy(dtype=float)) as shared:
+        report = parallel_map(partial(_solve_window, handle=shared.handle, dates=returns.index.to_numpy(),
+                                      columns=list(returns.columns), windows=windows),
+                              list(windows), workers=workers, chunksize=1, name='scenario windows')
+    if not report.ok:
+        print(report)
+    rows = [row for window in windows if window in report.results for row in report.results[window]]
+    return pd.DataFrame(rows, columns=['scenario', 'portfolio', 'ticker', 'allocation', 'returns',
+                                       'volatility', 'sharpe'])
+
+
+if __name__ == '__main__':
+    stock_list = ['XOM', 'CVX', 'COP']
+
+    # The last year of stored prices
+    source = price_sources.BarStoreSource()
+    end_date = source.prices().index[-1]
+    start_date = end_date - dt.timedelta(days=365)
+
+    mean_returns, cov_matrix = get_data(stock_list, start_date, end_date, source)
+
+    #print(calculated_results(mean_returns, cov_matrix))
+
+    EF_graph(mean_returns, cov_matrix)
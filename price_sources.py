@@ -0,0 +1,103 @@
+"""
+Offline price sources for the portfolio optimizer: adjusted closes from the local bar store
+or a closes file, with mean returns and covariance memoized per tickers and window
+"""
+
+import os
+import pandas as pd
+import bar_store
+import dividends
+import loaders
+import trading_calendar
+
+_moments = {}
+
+
+class PriceSource:
+    """
+    Interface for adjusted close prices. Subclasses implement prices() and key(), where key
+    changes whenever the underlying data does so memoized moments are invalidated
+    """
+    def prices(self):
+        "Returns adjusted closes as a (dates x tickers) frame"
+        raise NotImplementedError
+
+    def key(self):
+        raise NotImplementedError
+
+    def moments(self, tickers=None, start=None, end=None):
+        """
+        Returns the mean and covariance of daily simple returns of the adjusted closes
+        between start and end, memoized per (tickers, window)
+        """
+        tickers = tuple(tickers) if tickers is not None else None
+        cache_key = (self.key(), tickers, start, end)
+        if cache_key not in _moments:
+            returns = self.returns(tickers, start, end)
+            _moments[cache_key] = (returns.mean(), returns.cov())
+        return _moments[cache_key]
+
+    def returns(self, tickers=None, start=None, end=None):
+        "Returns daily simple returns of the adjusted closes between start and end"
+        prices = self.prices()
+        if tickers is not None:
+            prices = prices[list(tickers)]
+        if (start is not None or end is not None) and not isinstance(prices.index, pd.DatetimeIndex):
+            raise ValueError(f"{type(self).__name__} prices have no dates to select {start} to {end} from, "
+                             "closes files written before the trading calendar can be rebuilt with "
+                             "`python main.py build-closes`")
+        # Prices may be stored as float32, returns and moments are computed in float64
+        prices = prices.loc[_timestamp(start):_timestamp(end)].astype('float64')
+        return prices.pct_change(fill_method=None).iloc[1:]
+
+
+class BarStoreSource(PriceSource):
+    """
+    Closes of the local bar store (split adjusted by Polygon), dividend adjusted from the stored
+    dividends so returns match Yahoo's Adj Close: (close + dividend going ex) / previous close
+    """
+    def __init__(self, path=bar_store.DEFAULT_PATH, dividends_path=dividends.DIVIDENDS_PATH):
+        self.path = path
+        self.dividends_path = dividends_path if dividends_path and os.path.isdir(dividends_path) else None
+        self._prices = None
+
+    def key(self):
+        return ('bars', os.path.abspath(self.path), self.dividends_path, tuple(bar_store.source_signature(self.path)))
+
+    def prices(self):
+        key = self.key()
+        if self._prices is None or self._prices[0] != key:
+            closes = trading_calendar.aligned_prices(self.path, 'c', fill='ffill')
+            if self.dividends_path is not None:
+                closes = dividends.total_return_index(closes, dividends.load_dividends(self.dividends_path))
+            self._prices = (key, closes)
+        return self._prices[1]
+
+
+class ClosesFileSource(PriceSource):
+    """
+    Closes saved by get_closing_prices (0-closes.csv), used as they are
+    """
+    def __init__(self, file=f"{bar_store.DEFAULT_PATH}/0-closes.csv"):
+        self.file = file
+        self._prices = None
+
+    def key(self):
+        stat = os.stat(self.file)
+        return ('closes', os.path.abspath(self.file), stat.st_size, stat.st_mtime_ns)
+
+    def prices(self):
+        key = self.key()
+        if self._prices is None or self._prices[0] != key:
+            # Files written before the trading calendar keep their plain row number index,
+            # returns() refuses date windows on them
+            self._prices = (key, loaders.read_csv(self.file, 'closes'))
+        return self._prices[1]
+
+
+def _timestamp(date):
+    return pd.Timestamp(date) if date is not None else None
+
+
+def clear_cache():
+    _moments.clear()
@@ -0,0 +1,149 @@
+"""
+Reference data store: one flattened row per ticker with exchange, type and SIC codes
+joined to their descriptions, and long text kept in a separate table
+"""
+
+import os
+import pandas as pd
+
+PATH = 'Data/Reference_Data'
+DETAILS_PATH = 'Data/Ticker_Details'
+SIC_FILE = 'Data/SIC Code List/sic_code_list.csv'
+TYPES_FILE = 'Data/Ticker_Types/ticker_types.csv'
+
+NESTED = ('address', 'branding')
+TEXT_COLUMNS = ['description']
+CATEGORY_COLUMNS = ['market', 'locale', 'primary_exchange', 'type', 'currency_name', 'sic_code',
+                    'address_state', 'address_city']
+
+_store = {}
+
+
+def flatten_details(results):
+    """
+    Flattens one /v3/reference/tickers/{ticker} results object into a single row,
+    nested objects become prefixed columns (address_city, branding_logo_url, ...)
+    """
+    row = {key: value for key, value in results.items() if not isinstance(value, dict)}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            row.update({f"{key}_{field}": field_value for field, field_value in value.items()})
+    return row
+
+
+def read_details_csv(file):
+    """
+    Rebuilds the flattened row from a *_details.csv written by get_ticker_details,
+    which holds one duplicate row per nested address/branding key
+    """
+    details = pd.read_csv(file, index_col=0, dtype={'cik': str, 'sic_code': str})
+    row = details.iloc[0].drop([key for key in NESTED if key in details]).to_dict()
+    for key in NESTED:
+        if key in details:
+            values = details[key].dropna()
+            row.update({f"{key}_{field}": value for field, value in values.items()})
+    return row
+
+
+def _tables(rows):
+    frame = pd.DataFrame(rows).drop_duplicates('ticker', keep='last').set_index('ticker')
+    text = frame[[column for column in TEXT_COLUMNS if column in frame]]
+    return frame.drop(columns=text.columns), text
+
+
+def upsert(rows, path=PATH):
+    """
+    Inserts or replaces the flattened rows (dicts or a frame) by ticker and saves the store
+    """
+    if not os.path.exists(path):
+        # Create a new directory because it does not exist
+        os.makedirs(path)
+        print("Path didn't exist. A new directory is created!")
+
+    if isinstance(rows, pd.DataFrame):
+        rows = rows.reset_index().to_dict('records') if 'ticker' not in rows else rows.to_dict('records')
+    tickers, text = _tables(rows)
+
+    if os.path.exists(f"{path}/tickers.csv"):
+        stored, stored_text = _read(path)
+        tickers = pd.concat([stored[~stored.index.isin(tickers.index)], tickers])
+        text = pd.concat([stored_text[~stored_text.index.isin(text.index)], text])
+
+    tickers.sort_index().to_csv(f"{path}/tickers.csv")
+    text.sort_index().to_csv(f"{path}/descriptions.csv")
+    source = os.path.abspath(path)
+    for key in [key for key in _store if key[0] == source]:
+        del _store[key]
+    print(f"{len(rows)} tickers upserted, {len(tickers)} in store")
+    return len(rows)
+
+
+def import_details_csv(details_path=DETAILS_PATH, path=PATH):
+    """
+    Loads every *_details.csv in details_path into the store
+    """
+    rows = [read_details_csv(f"{details_path}/{file}") for file in sorted(os.listdir(details_path))
+            if file.endswith('_details.csv')]
+    return upsert(rows, path)
+
+
+def _read(path):
+    tickers = pd.read_csv(f"{path}/tickers.csv", index_col='ticker', dtype={'cik': str, 'sic_code': str})
+    text = pd.read_csv(f"{path}/descriptions.csv", index_col='ticker')
+    return tickers, text
+
+
+def load(path=PATH):
+    """
+    Returns the ticker table with categorical codes and the SIC office/industry and
+    ticker type description joined in. Cached until the store is written again
+    """
+    key = (os.path.abspath(path), None)
+    if key in _store:
+        return _store[key]
+
+    tickers, _ = _read(path)
+
+    sic = pd.read_csv(SIC_FILE, index_col=0, dtype={'SIC Code': str})
+    sic = sic.rename(columns={'SIC Code': 'sic_code', 'Office': 'sector', 'Industry Title': 'industry'})
+    types = pd.read_csv(TYPES_FILE, index_col=0).rename(columns={'code': 'type', 'description': 'type_description'})
+
+    tickers = (tickers.reset_index()
+               .merge(sic.drop_duplicates('sic_code'), on='sic_code', how='left')
+               .merge(types[['type', 'type_description']].drop_duplicates('type'), on='type', how='left')
+               .set_index('ticker'))
+    for column in CATEGORY_COLUMNS + ['sector', 'industry', 'type_description']:
+        if column in tickers:
+            tickers[column] = tickers[column].astype('category')
+
+    _store[key] = tickers
+    return tickers
+
+
+def description(ticker, path=PATH):
+    """
+    Returns the long company description of ticker
+    """
+    return _read(path)[1].loc[ticker, 'description']
+
+
+def lookup(column, path=PATH):
+    """
+    Returns a {ticker: value} dictionary for one column of the store
+    """
+    key = (os.path.abspath(path), column)
+    if key not in _store:
+        _store[key] = {ticker: value for ticker, value in load(path)[column].items() if pd.notna(value)}
+    return _store[key]
+
+
+def exists(path=PATH):
+    return os.path.exists(f"{path}/tickers.csv")
+
+
+def sector_of(ticker, path=PATH):
+    return lookup('sector', path).get(ticker)
+
+
+def industry_of(ticker, path=PATH):
+    return lookup('industry', path).get(ticker)
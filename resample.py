@@ -0,0 +1,80 @@
+"""
+Weekly, monthly and custom OHLCV bars built from the local bar store
+"""
+
+import os
+import pandas as pd
+import bar_store
+
+PERIODS = {
+    'daily': 'D',
+    'weekly': 'W-FRI',
+    'monthly': 'ME',
+    'quarterly': 'QE',
+    'yearly': 'YE',
+}
+
+_cache = {}
+
+
+def period_offset(period):
+    """
+    Translates a period name or pandas offset alias into an offset
+    """
+    alias = PERIODS.get(period, period)
+    try:
+        return pd.tseries.frequencies.to_offset(alias)
+    except ValueError:
+        # Older pandas only knows the month/quarter/year-end aliases without the 'E'
+        return pd.tseries.frequencies.to_offset(alias.rstrip('E'))
+
+
+def resample_bars(bars, period):
+    """
+    Aggregates a long bar frame (ticker, t, o, h, l, c, v, vw, n) to period bars
+    for all tickers in one grouped reduction
+    """
+    bars = bars.assign(pv=bars['vw'] * bars['v'])
+    grouped = bars.groupby(['ticker', pd.Grouper(key='t', freq=period_offset(period))],
+                           observed=True, sort=True)
+    agg = grouped.agg(o=('o', 'first'), h=('h', 'max'), l=('l', 'min'), c=('c', 'last'),
+                      v=('v', 'sum'), pv=('pv', 'sum'), n=('n', 'sum'))
+    # Periods without any trading (e.g. holiday weeks) come back empty
+    agg = agg[agg['v'] > 0]
+    agg['vw'] = (agg['pv'] / agg['v']).round(4)
+    return agg.drop(columns=['pv'])[['o', 'h', 'l', 'c', 'v', 'vw', 'n']]
+
+
+def get_resampled(path=bar_store.DEFAULT_PATH, period='weekly'):
+    """
+    Returns resampled bars for every ticker in path, indexed by (ticker, t).
+    Results are cached per (path, period) and rebuilt once a bar file changes
+    """
+    source = os.path.abspath(path)
+    signature = bar_store.source_signature(path)
+
+    cached = _cache.get((source, period))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    raw = _cache.get((source, None))
+    if raw is None or raw[0] != signature:
+        raw = (signature, bar_store.load_bars(path))
+        _cache[(source, None)] = raw
+
+    result = raw[1].set_index(['ticker', 't']) if period is None else resample_bars(raw[1], period)
+    _cache[(source, period)] = (signature, result)
+    return result
+
+
+def resampled_closes(path=bar_store.DEFAULT_PATH, period='weekly'):
+    """
+    Returns period closes with one column per ticker
+    """
+    closes = get_resampled(path, period)['c'].unstack(level='ticker')
+    closes.columns = closes.columns.astype(str)
+    return closes
+
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,211 @@
+"""
+Risk analytics: historical, parametric and Monte Carlo VaR/CVaR, maximum drawdown
+and rolling beta, for weight vectors or every ticker in the universe at once.
+Inputs are daily log returns. VaR and CVaR are losses in simple return units reported as
+positive numbers, whether historical, parametric or simulated
+"""
+
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import bar_store
+import trading_calendar
+
+
+def load_returns(path=bar_store.DEFAULT_PATH):
+    """
+    Returns daily log returns of the stored closes, days missing for a ticker stay NaN
+    """
+    closes = trading_calendar.aligned_prices(path, 'c')
+    return np.log(closes).diff().iloc[1:]
+
+
+def portfolio_returns(returns, weights):
+    """
+    Returns the daily simple returns of a portfolio from log returns, weights aligned to the
+    returns columns. Log returns do not add up across assets, simple returns do
+    """
+    weights = pd.Series(weights, index=returns.columns) if not isinstance(weights, pd.Series) else weights
+    return np.expm1(returns[weights.index].dropna()) @ weights.to_numpy()
+
+
+def _tail(values, alpha):
+    """
+    VaR and CVaR of each column of a NaN-free matrix, with a partial sort (np.partition)
+    that only places the k worst returns instead of sorting the whole column
+    """
+    k = max(1, int(np.floor(alpha * len(values))))
+    worst = np.partition(values, k - 1, axis=0)[:k]
+    return -worst.max(axis=0), -worst.mean(axis=0)
+
+
+def historical_var(returns, alpha=0.05):
+    """
+    Returns historical VaR and CVaR at level alpha per column (or for a single series)
+    """
+    if isinstance(returns, pd.Series):
+        var, cvar = _tail(returns.dropna().to_numpy()[:, None], alpha)
+        return float(var[0]), float(cvar[0])
+
+    values = returns.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=0)
+    var = np.full(values.shape[1], np.nan)
+    cvar = np.full(values.shape[1], np.nan)
+
+    # Columns with the same number of observations share one partition call,
+    # NaNs are pushed to the bottom of the column so they are never among the worst
+    for count in np.unique(counts[counts > 0]):
+        columns = np.flatnonzero(counts == count)
+        block = np.where(valid[:, columns], values[:, columns], np.inf)
+        var[columns], cvar[columns] = _tail(block, alpha * count / len(values))
+    return pd.Series(var, index=returns.columns), pd.Series(cvar, index=returns.columns)
+
+
+def parametric_var(returns, alpha=0.05):
+    """
+    Returns Gaussian VaR and CVaR at level alpha per column (or for a single series)
+    """
+    mu, sigma = returns.mean(), returns.std()
+    z = NormalDist().inv_cdf(alpha)
+    var = -(mu + z * sigma)
+    cvar = -(mu - sigma * NormalDist().pdf(z) / alpha)
+    return var, cvar
+
+
+def _factor(cov):
+    """
+    Returns L with L @ L.T == cov, from Cholesky when cov is positive definite, otherwise from
+    the eigendecomposition with negative eigenvalues (pairwise NaN covariances) clipped to zero
+    """
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(cov)
+        return vectors * np.sqrt(np.clip(values, 0, None))
+
+
+def simulate_returns(returns, simulations=100_000, horizon=1, seed=None):
+    """
+    Returns a (simulations x tickers) matrix of simple returns over horizon days, from daily log
+    returns drawn jointly normal with the mean and covariance of returns and compounded, so the
+    asset correlations and the skew of compounding are kept
+    """
+    mu = returns.mean().to_numpy() * horizon
+    factor = _factor(returns.cov().to_numpy() * horizon)
+    draws = np.random.default_rng(seed).standard_normal((simulations, len(mu)))
+    return np.expm1(draws @ factor.T + mu)
+
+
+def monte_carlo_var(returns, weights, alpha=0.05, simulations=100_000, horizon=1, seed=None):
+    """
+    Returns VaR and CVaR of a portfolio from simulate_returns, the simulated asset returns
+    combined with the weights
+    """
+    simulated = simulate_returns(returns.dropna(), simulations, horizon, seed) @ np.asarray(weights, dtype=float)
+    var, cvar = _tail(simulated[:, None], alpha)
+    return float(var[0]), float(cvar[0])
+
+
+def max_drawdown(returns):
+    """
+    Returns the maximum peak to trough loss of the cumulated log returns per column
+    """
+    values = returns.to_numpy(dtype=float)
+    wealth = np.exp(np.nancumsum(values, axis=0))
+    peak = np.maximum.accumulate(np.maximum(wealth, 1), axis=0)
+    drawdown = 1 - (wealth / peak).min(axis=0)
+    if isinstance(returns, pd.Series):
+        return float(drawdown)
+    return pd.Series(drawdown, index=returns.columns)
+
+
+def _window_sums(values, window):
+    """
+    Rolling sums over window rows from one cumulative sum, O(1) per step
+    """
+    cumulative = np.cumsum(values, axis=0)
+    sums = cumulative.copy()
+    sums[window:] = cumulative[window:] - cumulative[:-window]
+    sums[:window - 1] = np.nan
+    return sums
+
+
+def rolling_beta(returns, market=None, window=63):
+    """
+    Returns the rolling beta of every column against market (default: equal weighted average
+    of the columns), updated incrementally from running sums of x, y, xy and x^2
+    """
+    if market is None:
+        market = returns.mean(axis=1)
+    y = returns.to_numpy(dtype=float)
+    x = np.broadcast_to(market.reindex(returns.index).to_numpy(dtype=float)[:, None], y.shape)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = np.where(valid, x, 0), np.where(valid, y, 0)
+
+    n = _window_sums(valid.astype(float), window)
+    sx, sy = _window_sums(x, window), _window_sums(y, window)
+    sxy, sxx = _window_sums(x * y, window), _window_sums(x * x, window)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        beta = (sxy - sx * sy / n) / (sxx - sx * sx / n)
+    # Windows with gaps are left out rather than estimated from fewer days
+    beta[n < window] = np.nan
+    return pd.DataFrame(beta, index=returns.index, columns=returns.columns)
+
+
+def rolling_var(returns, window=252, alpha=0.05):
+    """
+    Returns rolling historical VaR; pandas keeps each window in a sorted skiplist that is
+    updated as the window moves instead of sorting every window
+    """
+    return -returns.rolling(window).quantile(alpha, interpolation='lower')
+
+
+def universe_risk(returns=None, alpha=0.05, market=None, beta_window=63, simulations=10_000, horizon=1, seed=None):
+    """
+    Returns one row of risk measures per ticker. The Monte Carlo columns come from one joint
+    simulation of the whole universe (simulations=0 leaves them out)
+    """
+    if returns is None:
+        returns = load_returns()
+    # VaR in simple returns like the simulation, volatility, drawdown and beta from the log returns
+    simple = np.expm1(returns)
+    hist_var, hist_cvar = historical_var(simple, alpha)
+    param_var, param_cvar = parametric_var(simple, alpha)
+    if simulations:
+        mc_var, mc_cvar = _tail(simulate_returns(returns, simulations, horizon, seed), alpha)
+    else:
+        mc_var = mc_cvar = np.full(returns.shape[1], np.nan)
+    return pd.DataFrame({
+        'volatility': returns.std() * np.sqrt(252),
+        'hist_var': hist_var,
+        'hist_cvar': hist_cvar,
+        'param_var': param_var,
+        'param_cvar': param_cvar,
+        'mc_var': mc_var,
+        'mc_cvar': mc_cvar,
+        'max_drawdown': max_drawdown(returns),
+        'beta': rolling_beta(returns, market, beta_window).iloc[-1],
+    })
+
+
+def portfolio_risk(returns, weights, alpha=0.05, simulations=100_000, seed=None):
+    """
+    Returns the risk measures of one portfolio
+    """
+    weights = pd.Series(weights, index=returns.columns) if not isinstance(weights, pd.Series) else weights
+    daily = portfolio_returns(returns, weights)
+    hist_var, hist_cvar = historical_var(daily, alpha)
+    param_var, param_cvar = parametric_var(daily, alpha)
+    mc_var, mc_cvar = monte_carlo_var(returns[weights.index], weights.to_numpy(), alpha, simulations, seed=seed)
+    return pd.Series({
+        'volatility': daily.std() * np.sqrt(252),
+        'hist_var': hist_var,
+        'hist_cvar': hist_cvar,
+        'param_var': param_var,
+        'param_cvar': param_cvar,
+        'mc_var': mc_var,
+        'mc_cvar': mc_cvar,
+        'max_drawdown': max_drawdown(np.log1p(daily)),
+    })
@@ -0,0 +1,119 @@
+"""
+Universe screener over a precomputed per-ticker summary table
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import bar_store
+import reference_data
+
+UNIVERSE_FILE = 'Data/Tickers/NYSE_stocks_CS.csv'
+SUMMARY_FILE = '0-summary.csv'
+VOL_WINDOW = 21
+DOLLAR_VOLUME_WINDOW = 21
+RETURN_WINDOWS = (5, 21, 63, 252)
+
+_summaries = {}
+
+
+def load_universe(file=UNIVERSE_FILE):
+    """
+    Returns ticker and name of every security in a get_tickers listing
+    """
+    return pd.read_csv(file, usecols=['ticker', 'name']).set_index('ticker')
+
+
+def summarize(bars):
+    """
+    Returns the screening metrics for one ticker's most recent bars
+    """
+    closes = bars['c'].to_numpy(dtype=float)
+    returns = np.diff(np.log(closes[-(VOL_WINDOW + 1):]))
+    dollar_volume = (bars['v'] * bars['c']).to_numpy(dtype=float)[-DOLLAR_VOLUME_WINDOW:]
+
+    summary = {
+        'last_date': bars['t'].iloc[-1].date().isoformat(),
+        'last_close': closes[-1],
+        # Same 21-day volatility of log returns as calc_vol
+        'volatility': returns.std(ddof=1) if len(returns) == VOL_WINDOW else np.nan,
+        # Average of the daily dollar_volume computed in adj_bars
+        'dollar_volume': dollar_volume.mean(),
+    }
+    for window in RETURN_WINDOWS:
+        summary[f'return_{window}d'] = closes[-1] / closes[-window - 1] - 1 if len(closes) > window else np.nan
+    return summary
+
+
+def update_summary(path=bar_store.DEFAULT_PATH):
+    """
+    Brings the summary table for path up to date, recomputing only tickers whose
+    bar file changed since the last update, and saves it as 0-summary.csv
+    """
+    file = f"{path}/{SUMMARY_FILE}"
+    if os.path.exists(file):
+        summary = pd.read_csv(file, index_col='ticker')
+    else:
+        summary = pd.DataFrame(columns=['size', 'mtime']).rename_axis('ticker')
+
+    signature = bar_store.source_signature(path)
+    stored = set(zip(summary.index, summary['size'], summary['mtime']))
+    changed = [ticker for ticker, size, mtime in signature if (ticker, size, mtime) not in stored]
+
+    rows = {}
+    for ticker, size, mtime in signature:
+        if ticker in changed:
+            bars = bar_store.read_tail(ticker, max(RETURN_WINDOWS) + 1, path)
+            rows[ticker] = {'size': size, 'mtime': mtime, **summarize(bars)}
+
+    current = [ticker for ticker, _, _ in signature]
+    summary = summary[summary.index.isin(current) & ~summary.index.isin(changed)]
+    if rows:
+        summary = pd.concat([summary, pd.DataFrame.from_dict(rows, orient='index').rename_axis('ticker')])
+    summary = summary.sort_index()
+
+    if rows or len(summary) != len(stored):
+        summary.to_csv(file)
+    _summaries[os.path.abspath(path)] = (tuple(signature), summary)
+    print(f"Summary updated for {len(rows)} of {len(summary)} tickers")
+    return summary
+
+
+def get_summary(path=bar_store.DEFAULT_PATH):
+    """
+    Returns the in-memory summary table, updating it if any bar file changed
+    """
+    cached = _summaries.get(os.path.abspath(path))
+    if cached is not None and cached[0] == bar_store.source_signature(path):
+        return cached[1]
+    return update_summary(path)
+
+
+def screen(where=None, sort=None, limit=None, path=bar_store.DEFAULT_PATH, universe=None):
+    """
+    Returns the tickers matching a filter expression over the summary metrics, e.g.
+    screen("last_close > 20 and volatility < 0.03", sort="-return_21d", limit=25)
+    Metrics: last_close, volatility, dollar_volume, return_5d, return_21d, return_63d, return_252d,
+    plus sector and industry once the reference data store is built
+    """
+    result = get_summary(path).drop(columns=['size', 'mtime'])
+    if reference_data.exists():
+        result['sector'] = result.index.map(reference_data.lookup('sector'))
+        result['industry'] = result.index.map(reference_data.lookup('industry'))
+
+    if universe is not None:
+        names = load_universe(universe) if isinstance(universe, str) else universe
+        result = result.join(names, how='inner')
+
+    if where:
+        result = result.query(where)
+
+    if sort:
+        keys = [sort] if isinstance(sort, str) else list(sort)
+        columns = [key.lstrip('-') for key in keys]
+        ascending = [not key.startswith('-') for key in keys]
+        result = result.sort_values(columns, ascending=ascending)
+
+    if limit:
+        result = result.head(limit)
+    return result
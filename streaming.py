@@ -0,0 +1,335 @@
+"""
+Intraday monitoring of the calc_vol signals: an asyncio consumer of Polygon style trade and
+aggregate messages keeping per-ticker rolling state in numpy arrays, a replay server streaming
+stored bars over TCP for offline runs, and alerts when abs_magnitude crosses a threshold
+"""
+
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+import bar_store
+
+# Daily returns in the volatility window, the same 21 as calc_vol
+WINDOW = 21
+THRESHOLD = 2.0
+POLYGON_URL = 'wss://socket.polygon.io/stocks'
+# Sessions are New York trading days, only ticks in regular hours set the session close
+TIMEZONE = 'America/New_York'
+REGULAR_HOURS = (pd.Timedelta(hours=9, minutes=30), pd.Timedelta(hours=16))
+# Alerts kept in Monitor.alerts for a consumer
+MAX_ALERTS = 10_000
+SIGNALS = ['c', 'returns', 'volatility', 'change', 'exp_change', 'magnitude', 'abs_magnitude']
+
+
+class RollingState:
+    """
+    Live calc_vol signals for many tickers. Each ticker keeps the log returns of its last
+    WINDOW - 1 completed sessions in a ring with their running sum and sum of squares, so the
+    21-day volatility including the current price updates in O(1) per tick
+    """
+    def __init__(self, tickers=(), capacity=1024):
+        self.index = {}
+        self.tickers = []
+        size = max(capacity, len(tickers))
+        self.ring = np.full((size, WINDOW - 1), np.nan)
+        self.head = np.zeros(size, dtype=np.int16)
+        self.count = np.zeros(size, dtype=np.int16)
+        self.sum = np.zeros(size)
+        self.sum_sq = np.zeros(size)
+        self.prev_close = np.full(size, np.nan)
+        self.last = np.full(size, np.nan)
+        self.day = np.full(size, np.iinfo(np.int32).min, dtype=np.int32)
+        self.above = np.zeros(size, dtype=bool)
+        self.codes(tickers)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def _grow(self, size):
+        old = len(self.prev_close)
+        for name, fill in [('ring', np.nan), ('head', 0), ('count', 0), ('sum', 0), ('sum_sq', 0),
+                           ('prev_close', np.nan), ('last', np.nan), ('day', np.iinfo(np.int32).min),
+                           ('above', False)]:
+            array = getattr(self, name)
+            grown = np.full((size,) + array.shape[1:], fill, dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+
+    def codes(self, tickers):
+        "Returns the row of each ticker, adding rows for tickers not seen before"
+        codes = np.empty(len(tickers), dtype=np.int64)
+        for i, ticker in enumerate(tickers):
+            code = self.index.get(ticker)
+            if code is None:
+                code = self.index[ticker] = len(self.tickers)
+                self.tickers.append(ticker)
+            codes[i] = code
+        if len(self.tickers) > len(self.prev_close):
+            self._grow(max(len(self.tickers), 2 * len(self.prev_close)))
+        return codes
+
+    def seed(self, ticker, closes, day):
+        "Starts a ticker from its last WINDOW completed session closes, the last one on day"
+        code = self.codes([ticker])[0]
+        returns = np.diff(np.log(np.asarray(closes, dtype=float)[-WINDOW:]))
+        self.ring[code] = np.nan
+        self.ring[code, :len(returns)] = returns
+        self.head[code] = len(returns) % (WINDOW - 1)
+        self.count[code] = len(returns)
+        self.sum[code], self.sum_sq[code] = returns.sum(), (returns * returns).sum()
+        self.prev_close[code] = closes[-1]
+        self.last[code] = np.nan
+        self.day[code] = day
+
+    def _roll(self, codes, days):
+        """
+        Closes the session of tickers whose events are from a later day: the last regular hours
+        price becomes the previous close and its return enters the ring
+        """
+        codes, first = np.unique(codes, return_index=True)
+        closed = codes[np.isfinite(self.last[codes]) & np.isfinite(self.prev_close[codes])]
+        if len(closed):
+            returns = np.log(self.last[closed] / self.prev_close[closed])
+            self.ring[closed, self.head[closed]] = returns
+            self.head[closed] = (self.head[closed] + 1) % (WINDOW - 1)
+            self.count[closed] = np.minimum(self.count[closed] + 1, WINDOW - 1)
+            # Re-summing the 20 slots instead of add/subtract keeps rounding from drifting over the days
+            ring = self.ring[closed]
+            self.sum[closed] = np.nansum(ring, axis=1)
+            self.sum_sq[closed] = np.nansum(ring * ring, axis=1)
+        started = np.isfinite(self.last[codes])
+        self.prev_close[codes[started]] = self.last[codes[started]]
+        self.last[codes] = np.nan
+        self.day[codes] = days[first]
+        self.above[codes] = False
+
+    def update(self, tickers, prices, days, regular=None):
+        """
+        Applies one batch of ticks (events of one message, in order) and returns the codes and
+        a dict of signal arrays with one entry per tick, named as the calc_vol columns.
+        Every tick gets signals, only those flagged in regular (all when None) move the session close
+        """
+        codes = self.codes(tickers)
+        prices = np.asarray(prices, dtype=float)
+        days = np.asarray(days, dtype=np.int32)
+        later = days > self.day[codes]
+        if later.any():
+            self._roll(codes[later], days[later])
+
+        prev_close = self.prev_close[codes]
+        returns = np.log(prices / prev_close)
+        n = self.count[codes] + 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            total = self.sum[codes] + returns
+            variance = (self.sum_sq[codes] + returns * returns - total * total / n) / (n - 1)
+            volatility = np.where(n == WINDOW, np.sqrt(np.maximum(variance, 0)), np.nan)
+            change = prices - prev_close
+            exp_change = volatility * prev_close
+            magnitude = change / exp_change
+        if regular is None:
+            self.last[codes] = prices
+        else:
+            regular = np.asarray(regular, dtype=bool)
+            self.last[codes[regular]] = prices[regular]
+        return codes, {'c': prices, 'returns': returns, 'volatility': volatility, 'change': change,
+                       'exp_change': exp_change, 'magnitude': magnitude, 'abs_magnitude': np.abs(magnitude)}
+
+    def crossings(self, codes, abs_magnitude, threshold=THRESHOLD):
+        """
+        Returns the positions of ticks where abs_magnitude moved above threshold, at most one per
+        ticker and batch. A ticker alerts again after falling back below or on the next session
+        """
+        above = abs_magnitude >= threshold
+        rising = np.flatnonzero(above & ~self.above[codes])
+        rising = rising[np.unique(codes[rising], return_index=True)[1]]
+        # The state follows the last tick of each ticker in the batch
+        last = len(codes) - 1 - np.unique(codes[::-1], return_index=True)[1]
+        self.above[codes[last]] = above[last]
+        return np.sort(rising)
+
+    def snapshot(self):
+        "Returns the current signals of every ticker from its last price"
+        codes = np.arange(len(self.tickers))
+        prices, last = self.last[codes], self.last[codes].copy()
+        days = self.day[codes]
+        _, signals = self.update(self.tickers, prices, days)
+        self.last[codes] = last
+        return pd.DataFrame(signals, index=pd.Index(self.tickers, name='ticker'), columns=SIGNALS)
+
+
+def session_days(times):
+    """
+    Returns the New York session day (days since 1970-01-01) of UTC times in ms, and whether
+    each time falls in regular hours
+    """
+    local = pd.to_datetime(np.asarray(times, dtype=np.int64), unit='ms', utc=True).tz_convert(TIMEZONE).tz_localize(None)
+    day = local.normalize()
+    offset = local - day
+    regular = (offset >= REGULAR_HOURS[0]) & (offset <= REGULAR_HOURS[1])
+    return day.to_numpy().astype('datetime64[D]').astype(np.int64), np.asarray(regular)
+
+
+def bar_times(t):
+    """
+    UTC times in ms of stored bar times: intraday bars are stored in UTC, daily bars as their
+    session date, stamped at the New York close so they fall in that session's regular hours
+    """
+    t = pd.DatetimeIndex(t)
+    if len(t) and (t == t.normalize()).all():
+        t = (t + REGULAR_HOURS[1]).tz_localize(TIMEZONE).tz_convert('UTC').tz_localize(None)
+    return t.to_numpy().astype('datetime64[ms]').astype(np.int64)
+
+
+def parse_events(message):
+    """
+    Returns (tickers, prices, days, regular, times in ms) of the trades ('T': price p at t) and
+    aggregates ('A', 'AM': close c at end e) in a Polygon stream message, status messages are skipped.
+    days are New York sessions and regular flags the ticks inside regular hours
+    """
+    tickers, prices, times = [], [], []
+    for event in json.loads(message) if isinstance(message, (str, bytes)) else message:
+        kind = event.get('ev')
+        if kind == 'T':
+            tickers.append(event['sym'])
+            prices.append(event['p'])
+            times.append(event['t'])
+        elif kind in ('A', 'AM'):
+            tickers.append(event['sym'])
+            prices.append(event['c'])
+            times.append(event['e'])
+    times = np.asarray(times, dtype=np.int64)
+    days, regular = session_days(times)
+    return tickers, np.asarray(prices, dtype=float), days, regular, times
+
+
+class Monitor:
+    """
+    Consumes a stream of messages, updates the rolling state and publishes an alert dict for every
+    threshold crossing to each callback and to the alerts queue. The queue keeps the latest
+    max_alerts alerts, dropping the oldest, so a service nobody reads it from does not grow
+    """
+    def __init__(self, state=None, threshold=THRESHOLD, callbacks=(), max_alerts=MAX_ALERTS):
+        self.state = state if state is not None else RollingState()
+        self.threshold = threshold
+        self.callbacks = list(callbacks)
+        self.alerts = asyncio.Queue(maxsize=max_alerts)
+        self.events = 0
+        self.alert_count = 0
+
+    def handle(self, message):
+        tickers, prices, days, regular, times = parse_events(message)
+        if not tickers:
+            return []
+        codes, signals = self.state.update(tickers, prices, days, regular)
+        self.events += len(codes)
+        alerts = []
+        for i in self.state.crossings(codes, signals['abs_magnitude'], self.threshold):
+            alert = {'ticker': tickers[i], 'time': pd.Timestamp(int(times[i]), unit='ms')}
+            alert.update({name: float(values[i]) for name, values in signals.items()})
+            alerts.append(alert)
+            self.alert_count += 1
+            if self.alerts.full():
+                self.alerts.get_nowait()
+            self.alerts.put_nowait(alert)
+            for callback in self.callbacks:
+                callback(alert)
+        return alerts
+
+    async def run(self, messages):
+        "Handles every message of an async iterator, e.g. tcp_messages or polygon_messages"
+        async for message in messages:
+            self.handle(message)
+        return self.events
+
+
+def seed_from_store(state, path=bar_store.DEFAULT_PATH, tickers=None, before=None):
+    """
+    Seeds state with the last WINDOW daily closes of each stored ticker (before the given date, so a
+    replay of that date starts from the sessions preceding it)
+    """
+    tickers = tickers or bar_store.list_tickers(path)
+    for ticker in tickers:
+        bars = bar_store.read_bars(ticker, path, columns=['t', 'c'])
+        if before is not None:
+            bars = bars[bars['t'] < pd.Timestamp(before)]
+        if len(bars):
+            day = int(session_days(bar_times(bars['t'])[-1:])[0][0])
+            state.seed(ticker, bars['c'].to_numpy(dtype=float)[-WINDOW:], day)
+    return state
+
+
+def replay_messages(path=bar_store.DEFAULT_PATH, tickers=None, start=None, end=None):
+    """
+    Yields stored bars as Polygon 'AM' messages, one JSON line per bar time with every ticker's bar,
+    so minute bars replay minute by minute and daily bars day by day
+    """
+    bars = bar_store.load_bars(path, tickers)
+    if start is not None:
+        bars = bars[bars['t'] >= pd.Timestamp(start)]
+    if end is not None:
+        bars = bars[bars['t'] <= pd.Timestamp(end)]
+    bars = bars.sort_values(['t', 'ticker'], kind='stable')
+    times = bar_times(bars['t'])
+    columns = {column: bars[column].to_numpy(dtype=float).round(4).tolist() for column in ['o', 'h', 'l', 'c', 'v']}
+    symbols = bars['ticker'].astype(str).tolist()
+    bounds = np.flatnonzero(np.diff(times)) + 1
+    for first, stop in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(times)]])):
+        yield json.dumps([{'ev': 'AM', 'sym': symbols[i], 'o': columns['o'][i], 'h': columns['h'][i],
+                           'l': columns['l'][i], 'c': columns['c'][i], 'v': columns['v'][i],
+                           's': int(times[i]), 'e': int(times[i])} for i in range(first, stop)])
+
+
+async def serve_replay(messages, host='127.0.0.1', port=8765, interval=0.0):
+    """
+    Starts a local server sending the messages (e.g. replay_messages) as newline delimited JSON
+    to every client, interval seconds apart, then closing the connection. Returns the asyncio server
+    """
+    messages = list(messages)
+
+    async def send(reader, writer):
+        for message in messages:
+            writer.write(message.encode() + b'\n')
+            await writer.drain()
+            if interval:
+                await asyncio.sleep(interval)
+        writer.close()
+        await writer.wait_closed()
+
+    return await asyncio.start_server(send, host, port)
+
+
+async def tcp_messages(host='127.0.0.1', port=8765):
+    "Yields the newline delimited messages of a replay server"
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 24)
+    try:
+        while line := await reader.readline():
+            yield line
+    finally:
+        writer.close()
+
+
+async def polygon_messages(key, channels='AM.*', url=POLYGON_URL):
+    "Yields the messages of Polygon's stocks websocket (pip install websockets)"
+    import websockets
+    async with websockets.connect(url, max_size=None) as socket:
+        await socket.send(json.dumps({'action': 'auth', 'params': key}))
+        await socket.send(json.dumps({'action': 'subscribe', 'params': channels}))
+        async for message in socket:
+            yield message
+
+
+async def replay(path=bar_store.DEFAULT_PATH, tickers=None, start=None, end=None, threshold=THRESHOLD,
+                 port=8765, interval=0.0, callbacks=(print,)):
+    """
+    Replays stored bars from start through a local server into a Monitor seeded with the sessions
+    before start (without start the first WINDOW sessions warm the state up), returning the monitor
+    """
+    state = RollingState()
+    if start is not None:
+        seed_from_store(state, path, tickers, before=start)
+    monitor = Monitor(state, threshold, callbacks)
+    server = await serve_replay(replay_messages(path, tickers, start, end), port=port, interval=interval)
+    async with server:
+        await monitor.run(tcp_messages(port=port))
+    return monitor
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.optimize as sc
+import portfolio_analysis as pa
+
+
+def moments(n=8, seed=0):
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (500, 2))
+    returns = pd.DataFrame(factors @ rng.normal(1, 0.3, (2, n)) + rng.normal(0.0006, 0.015, (500, n)),
+                           columns=[f"A{i}" for i in range(n)])
+    return returns.mean(), returns.cov()
+
+
+def plain_max_sharpe(mean_returns, cov_matrix, bounds=(0, 1)):
+    n = len(mean_returns)
+    return sc.minimize(pa.negative_sharpe_ratio, np.full(n, 1. / n), args=(mean_returns, cov_matrix), method='SLSQP',
+                       bounds=[bounds] * n, constraints={'type': 'eq', 'fun': lambda w: w.sum() - 1},
+                       options={'ftol': 1e-12, 'maxiter': 1000})
+
+
+def test_max_sharpe_matches_plain_slsqp():
+    mean_returns, cov_matrix = moments()
+    expected = plain_max_sharpe(mean_returns, cov_matrix)
+    result = pa.max_sharpe_ratio(mean_returns, cov_matrix)
+    assert result.fun == pytest.approx(expected.fun, abs=1e-5)
+    assert result.x.sum() == pytest.approx(1)
+
+
+def test_max_sharpe_interior_point_matches_plain_slsqp(monkeypatch):
+    mean_returns, cov_matrix = moments()
+    expected = plain_max_sharpe(mean_returns, cov_matrix, (0, 0.3))
+    # Force the interior point solver used above DENSE_LIMIT variables
+    monkeypatch.setattr(pa, 'DENSE_LIMIT', 0)
+    result = pa.max_sharpe_ratio(mean_returns, cov_matrix, constraint_set=(0, 0.3))
+    assert result.fun == pytest.approx(expected.fun, abs=1e-4)
+
+
+@pytest.mark.parametrize('dense_limit', [pa.DENSE_LIMIT, 0])
+@pytest.mark.parametrize('solve', [pa.max_sharpe_ratio, pa.minimize_variance])
+def test_caps_turnover_and_cardinality_hold(solve, dense_limit, monkeypatch):
+    monkeypatch.setattr(pa, 'DENSE_LIMIT', dense_limit)
+    mean_returns, cov_matrix = moments()
+    groups = {ticker: 'even' if i % 2 == 0 else 'odd' for i, ticker in enumerate(mean_returns.index)}
+    current = np.full(len(mean_returns), 1. / len(mean_returns))
+    constraints = (pa.PortfolioConstraints(mean_returns.index, (0, 0.4))
+                   .add_group_caps(groups, {'even': 0.6}).limit_turnover(current, 0.8).limit_assets(5))
+    weights = solve(mean_returns, cov_matrix, constraints=constraints).x
+    assert weights.sum() == pytest.approx(1)
+    assert weights.min() >= -1e-8 and weights.max() <= 0.4 + 1e-8
+    assert weights[::2].sum() <= 0.6 + 1e-8
+    assert np.abs(weights - current).sum() <= 0.8 + 1e-8
+    assert (weights > 1e-6).sum() <= 5
+
+
+@pytest.mark.parametrize('dense_limit', [pa.DENSE_LIMIT, 0])
+def test_infeasible_constraints_raise(dense_limit, monkeypatch):
+    monkeypatch.setattr(pa, 'DENSE_LIMIT', dense_limit)
+    mean_returns, cov_matrix = moments()
+    with pytest.raises(ValueError):
+        pa.calculated_results(mean_returns, cov_matrix, constraints=pa.PortfolioConstraints(mean_returns.index, (0, 0.1)))
+    # Dropping 3 of 8 equal weights takes a turnover of 0.75
+    current = np.full(len(mean_returns), 1. / len(mean_returns))
+    constraints = pa.PortfolioConstraints(mean_returns.index).limit_turnover(current, 0.3).limit_assets(5)
+    with pytest.raises(ValueError):
+        pa.minimize_variance(mean_returns, cov_matrix, constraints=constraints)
@@ -0,0 +1,185 @@
+"""
+Trading calendar built from the stored bars, mapping dates to integer day ordinals
+so prices, dividends, splits and news can be joined as integer arrays
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import bar_store
+import loaders
+
+# How a date that is not a trading day is mapped onto the calendar
+FILL_POLICIES = ('exact', 'next', 'prev')
+
+_cache = {}
+
+
+class TradingCalendar:
+    def __init__(self, dates):
+        self.days = np.unique(pd.to_datetime(pd.Series(dates)).dropna().values.astype('datetime64[D]'))
+        self.first = self.days[0]
+        self.last = self.days[-1]
+
+        # One slot per calendar day between first and last trading day,
+        # so any date resolves to its ordinal with a single array index
+        offsets = (self.days - self.first).astype(np.int64)
+        span = int(offsets[-1]) + 1
+        self._exact = np.full(span, -1, dtype=np.int32)
+        self._exact[offsets] = np.arange(len(self.days), dtype=np.int32)
+
+        marks = np.where(self._exact >= 0, self._exact, -1)
+        self._prev = np.maximum.accumulate(marks)
+        marks = np.where(self._exact >= 0, self._exact, len(self.days))
+        self._next = np.minimum.accumulate(marks[::-1])[::-1]
+        self._next[self._next == len(self.days)] = -1
+
+    def __len__(self):
+        return len(self.days)
+
+    def ordinals(self, dates, how='exact'):
+        """
+        Returns the day ordinal of each date, -1 where the date cannot be mapped.
+        how='exact' only matches trading days, 'next'/'prev' roll to the nearest trading day
+        """
+        if how not in FILL_POLICIES:
+            raise ValueError(f"how must be one of {FILL_POLICIES}, got {how!r}")
+
+        days = pd.to_datetime(pd.Series(dates)).values.astype('datetime64[D]')
+        offsets = (days - self.first).astype(np.int64)
+        result = np.full(len(offsets), -1, dtype=np.int32)
+
+        inside = (offsets >= 0) & (offsets < len(self._exact))
+        table = {'exact': self._exact, 'next': self._next, 'prev': self._prev}[how]
+        # Dates before the first or after the last trading day stay -1 under every policy,
+        # so events from outside the stored history are not piled onto its edges
+        result[inside] = table[offsets[inside]]
+        return result
+
+    def ordinal(self, date, how='exact'):
+        return int(self.ordinals([date], how)[0])
+
+    def dates(self, ordinals):
+        """
+        Returns the dates for an array of day ordinals
+        """
+        return pd.DatetimeIndex(self.days[np.asarray(ordinals)])
+
+    def to_matrix(self, frame, value, date_col='t', ticker_col='ticker', how='exact', fill=None, agg='last'):
+        """
+        Returns a (days x tickers) frame of value scattered by ordinal.
+        fill='ffill' carries the last value forward over missing days, fill=0 or any
+        other scalar fills the gaps with that value. agg='sum' adds up events that land
+        on the same day instead of keeping the last one
+        """
+        rows = self.ordinals(frame[date_col], how)
+        tickers = pd.Categorical(frame[ticker_col])
+        keep = rows >= 0
+        values = frame[value].to_numpy(dtype=float)[keep]
+
+        matrix = np.full((len(self.days), len(tickers.categories)), np.nan)
+        if agg == 'sum':
+            hit = np.zeros(matrix.shape, dtype=bool)
+            hit[rows[keep], tickers.codes[keep]] = True
+            matrix[hit] = 0
+            np.add.at(matrix, (rows[keep], tickers.codes[keep]), values)
+        else:
+            matrix[rows[keep], tickers.codes[keep]] = values
+
+        if fill == 'ffill':
+            matrix = _ffill(matrix)
+        elif fill is not None:
+            matrix[np.isnan(matrix)] = fill
+
+        return pd.DataFrame(matrix, index=pd.DatetimeIndex(self.days, name='t'),
+                            columns=[str(ticker) for ticker in tickers.categories])
+
+    def align(self, frame, date_col, how='exact'):
+        """
+        Returns frame with a 'day' ordinal column, dropping rows that fall off the calendar
+        """
+        frame = frame.assign(day=self.ordinals(frame[date_col], how))
+        return frame[frame['day'] >= 0]
+
+
+def _ffill(matrix):
+    """
+    Forward fills NaNs down each column
+    """
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    # Leading gaps point at row 0 and stay NaN
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+def get_calendar(path=bar_store.DEFAULT_PATH):
+    """
+    Returns the trading calendar of all days with at least one stored bar in path
+    """
+    source = os.path.abspath(path)
+    signature = bar_store.source_signature(path)
+    cached = _cache.get(source)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    dates = [bar_store.read_bars(ticker, path, columns=['t'])['t'] for ticker in bar_store.list_tickers(path)]
+    calendar = TradingCalendar(pd.concat(dates, ignore_index=True))
+    _cache[source] = (signature, calendar)
+    return calendar
+
+
+def aligned_prices(path=bar_store.DEFAULT_PATH, value='c', fill=None, workers=1, memory_limit=None):
+    """
+    Returns a (days x tickers) price matrix for the stored bars. Only the value column is read,
+    in batches of tickers of at most memory_limit bytes of csv. Prices are read as float64 since
+    the matrix is float64 and is saved by get_closing_prices
+    """
+    calendar = get_calendar(path)
+    matrices = [calendar.to_matrix(bars, value, fill=fill)
+                for bars in bar_store.iter_bars(path, workers=workers, columns=['t', value],
+                                                memory_limit=memory_limit, price=loaders.EXACT)]
+    return pd.concat(matrices, axis=1) if len(matrices) > 1 else matrices[0]
+
+
+def aligned_dividends(path='Data/Dividends_Data/Energy_S&P500', calendar=None):
+    """
+    Returns a (days x tickers) matrix of cash dividends on their ex-date, 0 elsewhere.
+    Ex-dates that are not trading days roll to the next trading day
+    """
+    if calendar is None:
+        calendar = get_calendar()
+    frames = [loaders.read_csv(f"{path}/{file}", 'dividends', ['ticker', 'ex_dividend_date', 'cash_amount'])
+              for file in sorted(os.listdir(path)) if file.endswith('_div.csv')]
+    divs = pd.concat(frames, ignore_index=True)
+    return calendar.to_matrix(divs, 'cash_amount', date_col='ex_dividend_date', how='next', fill=0, agg='sum')
+
+
+def aligned_splits(path, calendar=None):
+    """
+    Returns a (days x tickers) matrix of split ratios on their execution date, 1 elsewhere
+    """
+    if calendar is None:
+        calendar = get_calendar()
+    frames = [loaders.read_csv(f"{path}/{file}", 'splits', ['ticker', 'date', 'ratio'])
+              for file in sorted(os.listdir(path)) if file.endswith('.csv')]
+    splits = pd.concat(frames, ignore_index=True)
+    return calendar.to_matrix(splits, 'ratio', date_col='date', how='next', fill=1)
+
+
+def aligned_news(path='Data/Ticker_News', calendar=None):
+    """
+    Returns a (days x tickers) matrix of news article counts. Articles published on
+    a non-trading day count towards the next trading day
+    """
+    if calendar is None:
+        calendar = get_calendar()
+    frames = []
+    for file in sorted(os.listdir(path)):
+        if file.endswith('_news.csv'):
+            news = loaders.read_csv(f"{path}/{file}", 'news', ['published_utc'])
+            news['ticker'] = file[:-len('_news.csv')]
+            frames.append(news)
+    news = pd.concat(frames, ignore_index=True)
+    news['published_utc'] = news['published_utc'].dt.tz_localize(None).dt.normalize()
+    news['count'] = 1
+    return calendar.to_matrix(news, 'count', date_col='published_utc', how='next', fill=0, agg='sum')